@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+# Importaciones de la BASE de la librería
+from telegram import BotCommand, Update
+
+# Importaciones de las EXTENSIONES
+from telegram.ext import (
+    ApplicationBuilder,
+    CommandHandler,
+    ContextTypes,
+)
+
+import database
+import metrics
+import scraper
+from broadcaster import GLOBAL_RATE, Broadcaster
+from filters import FILTER_USAGE, OfferFilter
+from history import HistoryLog
+from leader import REPLICA_COUNT, REPLICA_INDEX, LeaderElection, Lease
+from outbox import IDLE_POLL_SECONDS, Outbox, OutboxSender
+from pipeline import ScanPipeline
+from scheduler import AdaptiveScheduler, hot_windows
+from state import BotState
+
+load_dotenv()
+
+REFRESH_INTERVAL_MINUTES = 1
+VERSION_RELEASE = "1.2.1"
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("Bot")
+
+TOKEN = os.getenv("BOT_TOKEN")
+# Local Prometheus endpoint (http://127.0.0.1:9108/metrics); 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# "polling" (default) or "webhook": Telegram POSTs updates to a local server
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Public HTTPS URL Telegram calls; usually a reverse proxy in front of the port
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+# Checked against the X-Telegram-Bot-Api-Secret-Token header of every POST
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Bot API server, e.g. a self-hosted one (default: api.telegram.org)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# With REPLICA_COUNT > 1, replicas re-read the shared state this often
+REPLICA_REFRESH_SECONDS = 30
+# ...and look for alerts queued by the leader for their chats this often
+REPLICA_OUTBOX_POLL_SECONDS = 2
+
+# Global application instance
+app = None
+# Rate-limited sender bound to app.bot (created in post_init)
+broadcaster = None
+# Alerts waiting to be delivered; survives restarts. Each replica sends its chats
+outbox = Outbox(partition=(REPLICA_INDEX, REPLICA_COUNT))
+# Background workers draining the outbox (started in post_init)
+outbox_sender = None
+# Users, offers and notified IDs served from memory (loaded in post_init)
+state = BotState()
+# Append-only log of every offer change, for price/drop-time analysis
+offer_history = HistoryLog()
+# Scan → diff → queue alerts → save, run by the scheduler
+pipeline = ScanPipeline(
+    state, outbox, offer_history, on_queued=lambda: outbox_sender.wake()
+)
+# Adaptive scan loop (created in post_init, runs until shutdown)
+scheduler = None
+# /metrics HTTP server (started in post_init when METRICS_PORT is set)
+metrics_server = None
+# Scanning lease shared by the replicas (REPLICA_COUNT > 1)
+election = None
+# Follower loop re-reading the shared state (REPLICA_COUNT > 1)
+refresher = None
+
+
+def load_hot_windows():
+    """Hours when offers have historically dropped, for the scheduler."""
+    return hot_windows(offer_history.drop_times())
+
+
+async def scheduled_scan() -> str:
+    """One scan; returns CHANGED, UNCHANGED or ERROR for the scheduler."""
+    if REPLICA_COUNT > 1:
+        # Subscribers and filters may have changed on the other replicas
+        await state.reload()
+    return await pipeline.scan()
+
+
+async def start_scanning():
+    """Elected leader: pick up where the previous leader left, then scan."""
+    if REPLICA_COUNT > 1:
+        await state.reload()
+        offer_history.reload()
+        scraper.reset_scan_cache()
+    scheduler.start()
+
+
+async def stop_scanning():
+    await scheduler.stop()
+
+
+async def refresh_replica_state():
+    """Followers keep /offers and the subscriber list close to the leader's."""
+    while True:
+        await asyncio.sleep(REPLICA_REFRESH_SECONDS)
+        if election.is_leader:
+            continue
+        try:
+            await state.reload()
+        except Exception as e:
+            logger.error(f"❌ Failed to reload the shared state: {e}")
+
+
+async def prune_dead_chats(report):
+    """Unsubscribes, in one write, the chats a broadcast found dead."""
+    dead = report.dead_chats()
+    if dead:
+        removed = await state.remove_users(dead)
+        logger.info(f"🗑️ Removed {removed} blocked or deleted chats")
+
+
+async def offers_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_chat.id
+    logger.info(f"User {user_id} requested offers.")
+
+    if await state.add_user(user_id):
+        logger.info(f"Usuario {user_id} auto-suscrito al usar /offers")
+
+        await update.message.reply_text(
+            "✅ <i>He notado que no estabas en la lista de alertas. Te he suscrito automáticamente. Usa /stop si no quieres recibir avisos.</i>",
+            parse_mode="HTML",
+        )
+
+    current_offers = state.current_offers()
+    logger.info(f"Serving {len(current_offers)} current/future offers from memory")
+
+    await update.message.reply_text(state.offers_message(), parse_mode="HTML")
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_chat.id
+    await state.add_user(user_id)
+    await update.message.reply_text(
+        f"✅ <b>¡Suscrito correctamente!</b> Te avisaré cuando detecte nuevas ofertas.\n\n"
+        f"<i>Bot version: {VERSION_RELEASE}</i>",
+        parse_mode="HTML",
+    )
+
+
+async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_chat.id
+    await state.remove_user(user_id)
+    await update.message.reply_text(
+        "🔕 <b>Suscripción cancelada.</b> Ya no recibirás más alertas.",
+        parse_mode="HTML",
+    )
+
+
+async def filter_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_chat.id
+    args = context.args or []
+
+    if not args:
+        current = state.filters.get(user_id)
+        description = current.describe() if current else "Todas las ofertas"
+        await update.message.reply_text(
+            f"🎯 <b>Tu filtro actual:</b>\n{description}\n\n{FILTER_USAGE}",
+            parse_mode="HTML",
+        )
+        return
+
+    if args[0].lower() == "off":
+        await state.set_filter(user_id, None)
+        await update.message.reply_text(
+            "🎯 Filtro eliminado. Recibirás todas las ofertas.", parse_mode="HTML"
+        )
+        return
+
+    try:
+        offer_filter = OfferFilter.parse(args)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\n\n{FILTER_USAGE}", parse_mode="HTML")
+        return
+
+    await state.add_user(user_id)
+    await state.set_filter(user_id, offer_filter)
+    await update.message.reply_text(
+        f"🎯 <b>Filtro guardado.</b> Solo te avisaré de:\n{offer_filter.describe()}",
+        parse_mode="HTML",
+    )
+
+
+async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    help_text = (
+        "🤖 <b>Pol Academy Offers Hunter</b>\n\n"
+        "Este bot escanea la academia de Pol Ferrer buscando ofertas: cada minuto "
+        "o menos en las horas en que suelen aparecer, y más espaciado cuando la "
+        "página lleva un rato sin cambios.\n\n"
+        "<b>Comandos disponibles:</b>\n"
+        "• /start - Suscribirse a las alertas automáticas.\n"
+        "• /offers - Ver las ofertas activas actualmente.\n"
+        "• /filter - Recibir solo las ofertas que te interesan.\n"
+        "• /stop - Dejar de recibir notificaciones.\n"
+        "• /help - Mostrar este mensaje de ayuda.\n\n"
+        f"<i>Version: {VERSION_RELEASE}</i>"
+    )
+    await update.message.reply_text(help_text, parse_mode="HTML")
+
+
+async def post_init(application):
+    """Configure bot commands after the application has been initialized."""
+    global broadcaster, outbox_sender, scheduler, metrics_server, election, refresher
+    # Telegram's limit is per bot: the replicas split it
+    broadcaster = Broadcaster(application.bot, global_rate=GLOBAL_RATE / REPLICA_COUNT)
+    outbox_sender = OutboxSender(
+        outbox,
+        broadcaster,
+        on_report=prune_dead_chats,
+        poll_seconds=(
+            REPLICA_OUTBOX_POLL_SECONDS if REPLICA_COUNT > 1 else IDLE_POLL_SECONDS
+        ),
+    )
+    if METRICS_PORT:
+        metrics_server = await metrics.serve(port=METRICS_PORT)
+    await state.load()
+    # Starts by sending whatever a previous run left in the outbox; after the
+    # load, as its reports unsubscribe dead chats from the state
+    outbox_sender.start()
+    scheduler = AdaptiveScheduler(
+        scheduled_scan,
+        base_interval=REFRESH_INTERVAL_MINUTES * 60,
+        windows_source=load_hot_windows,
+    )
+    if REPLICA_COUNT > 1:
+        # Only the lease holder scans; every replica serves commands and sends
+        election = LeaderElection(
+            Lease(holder=f"replica-{REPLICA_INDEX}-{os.getpid()}"),
+            on_elected=start_scanning,
+            on_demoted=stop_scanning,
+        )
+        election.start()
+        refresher = asyncio.create_task(refresh_replica_state())
+    else:
+        await start_scanning()
+
+    commands = [
+        BotCommand("start", "Suscribirse a las alertas"),
+        BotCommand("offers", "Ver ofertas actuales"),
+        BotCommand("filter", "Filtrar las alertas"),
+        BotCommand("stop", "Cancelar suscripción"),
+        BotCommand("help", "Información del bot"),
+    ]
+    await application.bot.set_my_commands(commands)
+    logger.info("✅ Commands set successfully.")
+
+
+async def post_shutdown(application):
+    """Stop scanning, flush pending writes and release pooled HTTP connections."""
+    if refresher is not None:
+        refresher.cancel()
+    if election is not None:
+        # Hands the lease to another replica right away
+        await election.stop()
+    if scheduler is not None:
+        await scheduler.stop()
+    if outbox_sender is not None:
+        await outbox_sender.stop()
+    await state.close()
+    await scraper.close_async_client()
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+
+
+def run():
+    """Builds the application and runs it until stopped (`main.py serve`)."""
+    global app
+    if not TOKEN:
+        logger.error("Error: BOT_TOKEN not found in environment variables.")
+        exit(1)
+    shareable = database.DB_BACKEND == "sqlite" and BOT_MODE == "webhook"
+    if REPLICA_COUNT > 1 and not shareable:
+        # JSON files can't be shared between processes, and only one can poll
+        logger.error(
+            "Error: REPLICA_COUNT > 1 needs DB_BACKEND=sqlite and BOT_MODE=webhook."
+        )
+        exit(1)
+
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+    app = builder.build()
+
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("stop", stop))
+    app.add_handler(CommandHandler("offers", offers_cmd))
+    app.add_handler(CommandHandler("filter", filter_cmd))
+    app.add_handler(CommandHandler("help", help_cmd))
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            logger.error("Error: BOT_MODE=webhook needs WEBHOOK_URL.")
+            exit(1)
+        logger.info(
+            f"Starting Offers Hunter Bot (webhook on "
+            f"{WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})..."
+        )
+        # The webhook server runs on the same loop as the scan scheduler
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        logger.info("Starting Offers Hunter Bot...")
+        app.run_polling()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from types import ModuleType
+from typing import Dict, List, Optional, Sequence, Set
+
+import metrics
+
+logger = logging.getLogger("Broadcaster")
+
+# Telegram allows ~30 messages/s across all chats and ~1 message/s per chat
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+MAX_CONCURRENCY = 20
+MAX_RETRIES = 3
+# Per-chat buckets idle for longer than this are dropped between broadcasts
+CHAT_BUCKET_TTL = 60
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # The lock makes waiters queue up in order instead of racing for tokens
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every acquirer for `seconds` (used for Telegram's RetryAfter)."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+    @property
+    def idle_since(self) -> float:
+        return self._updated
+
+
+def telegram_errors() -> ModuleType:
+    """
+    telegram.error, imported on the first failed send: offline runs such as
+    the replay deliver to a fake bot without loading python-telegram-bot.
+    """
+    import telegram.error
+
+    return telegram.error
+
+
+def is_dead_chat(error: Exception) -> bool:
+    """Blocked bot, deactivated user or deleted chat: it will never deliver."""
+    errors = telegram_errors()
+    if isinstance(error, errors.Forbidden):
+        return True
+    return (
+        isinstance(error, errors.BadRequest)
+        and "chat not found" in str(error).lower()
+    )
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BroadcastReport:
+    """Outcome, throughput and delivery latency of one broadcast."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.sent = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures: Dict[int, Exception] = {}
+        # Seconds from the start of the broadcast to each delivery
+        self.latencies: List[float] = []
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def dead_chats(self) -> Set[int]:
+        """Chats that failed for good and should be unsubscribed."""
+        return {
+            chat_id for chat_id, error in self.failures.items() if is_dead_chat(error)
+        }
+
+    def percentile(self, pct: float) -> float:
+        return percentile(self.latencies, pct)
+
+    def summary(self) -> str:
+        return (
+            f"📢 Broadcast: {self.sent} sent, {len(self.failures)} failed, "
+            f"{self.rate_limited} rate-limited in {self.elapsed:.2f}s "
+            f"({self.throughput:.1f} msg/s, p50 {self.percentile(50):.2f}s, "
+            f"p99 {self.percentile(99):.2f}s)"
+        )
+
+
+class Broadcaster:
+    """
+    Sends messages, from any number of concurrent callers (the outbox
+    sender's workers), while respecting Telegram's global and per-chat
+    limits. RetryAfter pauses all senders for the requested time; network
+    errors are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = GLOBAL_RATE,
+        per_chat_rate: float = PER_CHAT_RATE,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    def drop_idle_buckets(self) -> None:
+        """Forgets the per-chat limits of chats idle for CHAT_BUCKET_TTL."""
+        cutoff = time.monotonic() - CHAT_BUCKET_TTL
+        for chat_id in [c for c, b in self._chats.items() if b.idle_since < cutoff]:
+            del self._chats[chat_id]
+
+    async def send(self, chat_id: int, text: str, report: BroadcastReport) -> bool:
+        """Delivers one message, retrying rate limits and transient errors."""
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._global.acquire()
+            try:
+                with metrics.SEND_SECONDS.time():
+                    await self.bot.send_message(
+                        chat_id=chat_id, text=text, parse_mode="HTML"
+                    )
+                report.sent += 1
+                report.latencies.append(time.monotonic() - report.started)
+                return True
+            except Exception as e:
+                error = e
+            errors = telegram_errors()
+            if not isinstance(error, errors.TelegramError):
+                raise error
+            if isinstance(error, errors.RetryAfter):
+                delay = _seconds(error.retry_after)
+                report.rate_limited += 1
+                metrics.RATE_LIMITED.inc()
+                logger.warning(f"⏳ Rate limited by Telegram, pausing {delay:.0f}s")
+                self._global.pause(delay)
+            elif isinstance(error, (errors.BadRequest, errors.Forbidden)):
+                # Blocked bot, deleted chat... retrying will not help
+                report.failures[chat_id] = error
+                metrics.SEND_FAILURES.inc()
+                logger.error(f"Error sending message to {chat_id}: {error}")
+                return False
+            elif isinstance(error, errors.NetworkError):
+                await asyncio.sleep(2**attempt)
+            else:
+                report.failures[chat_id] = error
+                metrics.SEND_FAILURES.inc()
+                logger.error(f"Error sending message to {chat_id}: {error}")
+                return False
+            if attempt < self.max_retries:
+                report.retries += 1
+
+        report.failures[chat_id] = error
+        metrics.SEND_FAILURES.inc()
+        logger.error(f"Error sending message to {chat_id} after retries: {error}")
+        return False
+
+
+def _seconds(retry_after) -> float:
+    # python-telegram-bot reports retry_after as int seconds or a timedelta
+    if hasattr(retry_after, "total_seconds"):
+        return retry_after.total_seconds()
+    return float(retry_after)
@@ -1,39 +1,205 @@
+import atexit
 import json
 import os
 import logging
+import stat
+import tempfile
+import threading
+import time
 from datetime import datetime
 
+import sqlite_store
+from models import Offer, SortedOffers
+
 logger = logging.getLogger("Database")
 
 DB_PATH = "data"
 DB_FILE_USERS = os.path.join(DB_PATH, "database.json")
 DB_OFFERS_CACHE = os.path.join(DB_PATH, "offers_cache.json")
+DB_SQLITE = os.path.join(DB_PATH, "database.sqlite3")
+# Subscriber list of the old standalone bot (telegram_bot.py), imported once
+LEGACY_SUBSCRIBERS = "subscribers.json"
+
+# "json" (default) or "sqlite"; the SQLite store migrates the JSON files once
+DB_BACKEND = os.getenv("DB_BACKEND", "json")
+
+# JSON writes are buffered for this long so bursts of mutations hit the disk once
+WRITE_DEBOUNCE_SECONDS = 0.5
+
+# Read once: os.umask() can only be read by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Documents waiting to be written, by path. Readers see them before the disk.
+_pending = {}
+# Held across every read-modify-write so concurrent callers don't lose updates
+_lock = threading.RLock()
+_flush_timer = None
 
 
 def _setup():
     if not os.path.exists(DB_PATH):
         os.makedirs(DB_PATH)
     if not os.path.exists(DB_FILE_USERS):
-        with open(DB_FILE_USERS, "w") as f:
-            json.dump({"users": [], "offers": []}, f)
+        _atomic_write_json(DB_FILE_USERS, {"users": [], "offers": []})
+
+
+def _atomic_write_json(path, data):
+    """Writes to a temp file, fsyncs and renames it over `path`."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600: keep the mode the file had, or open()'s default
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    # Persist the rename itself
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def _load_json(path):
+    """Returns the pending document for `path`, else reads it from disk."""
+    if path in _pending:
+        return _pending[path]
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _store_json(path, data):
+    """Queues `data` for `path`; one flush covers every write in the window."""
+    global _flush_timer
+    _pending[path] = data
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(WRITE_DEBOUNCE_SECONDS, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush():
+    """Writes every pending JSON document now."""
+    global _flush_timer
+    with _lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        while _pending:
+            path, data = next(iter(_pending.items()))
+            _atomic_write_json(path, data)
+            del _pending[path]
+
+
+atexit.register(flush)
+
+
+def _use_sqlite():
+    return DB_BACKEND == "sqlite"
 
 
 def add_user(user_id):
-    data = _read()
-    if user_id not in data["users"]:
+    """Subscribes a user; returns False if they were already subscribed."""
+    if _use_sqlite():
+        return sqlite_store.add_user(user_id)
+    with _lock:
+        data = _read()
+        if user_id in data["users"]:
+            return False
         data["users"].append(user_id)
         _write(data)
+        return True
 
 
 def remove_user(user_id):
-    data = _read()
-    if user_id in data["users"]:
-        data["users"].remove(user_id)
+    remove_users([user_id])
+
+
+def remove_users(user_ids):
+    """Unsubscribes several users (and drops their filters) in one write."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    if _use_sqlite():
+        return sqlite_store.remove_users(user_ids)
+    with _lock:
+        data = _read()
+        kept = [user_id for user_id in data["users"] if user_id not in user_ids]
+        if len(kept) == len(data["users"]):
+            return
+        data["users"] = kept
+        filters = data.get("filters", {})
+        for user_id in user_ids:
+            filters.pop(str(user_id), None)
         _write(data)
 
 
+def import_legacy_subscribers():
+    """
+    Moves the chat IDs of subscribers.json into the users store, once.
+    The file is renamed afterwards so it is not imported again.
+    """
+    if not os.path.exists(LEGACY_SUBSCRIBERS):
+        return 0
+    try:
+        with open(LEGACY_SUBSCRIBERS, "r") as f:
+            chat_ids = json.load(f)
+    except ValueError as e:
+        logger.warning(f"Failed to read {LEGACY_SUBSCRIBERS}: {e}")
+        return 0
+    added = sum(1 for chat_id in chat_ids if add_user(chat_id))
+    os.replace(LEGACY_SUBSCRIBERS, f"{LEGACY_SUBSCRIBERS}.imported")
+    logger.info(f"Imported {added} subscribers from {LEGACY_SUBSCRIBERS}")
+    return added
+
+
+def get_filters():
+    """Per-user offer filters as {user_id: filter dict}."""
+    if _use_sqlite():
+        return sqlite_store.get_filters()
+    return {int(uid): f for uid, f in _read().get("filters", {}).items()}
+
+
+def set_filter(user_id, offer_filter):
+    """Stores a user's filter dict, or removes it when offer_filter is None."""
+    if _use_sqlite():
+        return sqlite_store.set_filter(user_id, offer_filter)
+    with _lock:
+        data = _read()
+        filters = data.setdefault("filters", {})
+        if offer_filter is None:
+            filters.pop(str(user_id), None)
+        else:
+            filters[str(user_id)] = offer_filter
+        _write(data)
+
+
+def offer_id(offer):
+    """Unique ID for an offer based on its details."""
+    if isinstance(offer, Offer):
+        return offer.id
+    return (
+        f"{offer.get('discipline', '')}_{offer.get('date', '')}_{offer.get('time', '')}"
+    )
+
+
 def _is_current_or_future_offer(offer):
     """Check if an offer is from today or a future date."""
+    if isinstance(offer, Offer):
+        return offer.is_current(datetime.now().date().toordinal())
     try:
         offer_date_str = offer.get("date", "")
         offer_date = datetime.strptime(offer_date_str, "%Y-%m-%d").date()
@@ -50,90 +216,112 @@ def _is_current_or_future_offer(offer):
 
 
 def save_offers(offers, date_range):
-    # Filter to keep only current and future offers
-    current_offers = [offer for offer in offers if _is_current_or_future_offer(offer)]
+    if _use_sqlite():
+        return sqlite_store.save_offers(offers, date_range)
+    # Keep only current and future offers (past days are a sorted prefix)
+    current_offers = SortedOffers(offers)
+    current_offers.prune(datetime.now().date())
 
-    # Generate IDs for current offers
-    current_offer_ids = set(
-        f"{offer.get('discipline', '')}_{offer.get('date', '')}_{offer.get('time', '')}"
-        for offer in current_offers
-    )
+    # IDs were built once, when the offers were parsed
+    current_offer_ids = set(offer.id for offer in current_offers)
 
-    # Preserve only notified IDs that correspond to current/future offers
-    old_notified = []
-    if os.path.exists(DB_OFFERS_CACHE):
-        try:
-            with open(DB_OFFERS_CACHE, "r") as f:
-                existing = json.load(f)
-                old_notified = existing.get("notified_offers", [])
-        except Exception as e:
-            logger.warning(f"Failed to read {DB_OFFERS_CACHE}: {e}")
+    with _lock:
+        # Preserve only notified IDs that correspond to current/future offers
+        old_notified = []
+        if DB_OFFERS_CACHE in _pending or os.path.exists(DB_OFFERS_CACHE):
+            try:
+                old_notified = _load_json(DB_OFFERS_CACHE).get("notified_offers", [])
+            except Exception as e:
+                logger.warning(f"Failed to read {DB_OFFERS_CACHE}: {e}")
 
-    # Keep only notified IDs that are still in current offers
-    cleaned_notified = [nid for nid in old_notified if nid in current_offer_ids]
+        # Keep only notified IDs that are still in current offers
+        cleaned_notified = [nid for nid in old_notified if nid in current_offer_ids]
 
-    data = {
-        "offers": current_offers,
-        "date_range": date_range,
-        "notified_offers": cleaned_notified,
-    }
+        data = {
+            "offers": [offer.to_dict() for offer in current_offers],
+            "date_range": date_range,
+            "notified_offers": cleaned_notified,
+        }
 
-    with open(DB_OFFERS_CACHE, "w") as f:
-        json.dump(data, f)
+        _setup()
+        _store_json(DB_OFFERS_CACHE, data)
 
 
 def load_cached_offers():
     """Load cached offers, filtering to keep only current and future ones."""
-    if not os.path.exists(DB_OFFERS_CACHE):
-        logger.debug(f"No {DB_OFFERS_CACHE} found")
-        return [], "unknown", []
-    with open(DB_OFFERS_CACHE, "r") as f:
-        data = json.load(f)
-        all_offers = data.get("offers", [])
+    if _use_sqlite():
+        return sqlite_store.load_cached_offers()
+    with _lock:
+        if DB_OFFERS_CACHE not in _pending and not os.path.exists(DB_OFFERS_CACHE):
+            logger.debug(f"No {DB_OFFERS_CACHE} found")
+            return [], "unknown", []
+        data = _load_json(DB_OFFERS_CACHE)
+        all_offers = SortedOffers(data.get("offers", []))
         logger.debug(f"Loaded {len(all_offers)} offers from cache, filtering...")
         # Filter again on load to ensure we only return current/future offers
-        current_offers = [
-            offer for offer in all_offers if _is_current_or_future_offer(offer)
-        ]
-        logger.debug(f"After filtering: {len(current_offers)} current/future offers")
+        all_offers.prune(datetime.now().date())
+        logger.debug(f"After filtering: {len(all_offers)} current/future offers")
         return (
-            current_offers,
+            all_offers.offers,
             data.get("date_range", "unknown"),
             data.get("notified_offers", []),
         )
 
 
+def read_snapshot():
+    """
+    (offers, date_range, notified IDs, subscriber count) as stored, without
+    creating, migrating or repairing anything, for `main.py dump-cache`.
+    Missing files read as empty.
+    """
+    if _use_sqlite():
+        return sqlite_store.read_snapshot()
+    offers, date_range, notified = load_cached_offers()
+    users = 0
+    if os.path.exists(DB_FILE_USERS):
+        with open(DB_FILE_USERS, "r") as f:
+            users = len(json.load(f).get("users", []))
+    return offers, date_range, notified, users
+
+
 def get_users():
+    if _use_sqlite():
+        return sqlite_store.get_users()
     return _read().get("users", [])
 
 
 def _read():
-    _setup()
-    try:
-        with open(DB_FILE_USERS, "r") as f:
-            return json.load(f)
-    except:
-        return {"users": [], "offers": []}
+    with _lock:
+        _setup()
+        try:
+            return _load_json(DB_FILE_USERS)
+        except ValueError as e:
+            # Never let the next write replace an unreadable file with an empty list
+            backup = f"{DB_FILE_USERS}.corrupt-{int(time.time())}"
+            logger.error(f"❌ Failed to read {DB_FILE_USERS} ({e}), kept as {backup}")
+            os.replace(DB_FILE_USERS, backup)
+            return {"users": [], "offers": []}
 
 
 def _write(data):
-    _setup()
-    with open(DB_FILE_USERS, "w") as f:
-        json.dump(data, f)
+    with _lock:
+        _setup()
+        _store_json(DB_FILE_USERS, data)
 
 
 def mark_offers_as_notified(offer_ids):
     """Mark offers as already notified to avoid duplicate alerts."""
-    if not os.path.exists(DB_OFFERS_CACHE):
-        return
-    try:
-        with open(DB_OFFERS_CACHE, "r") as f:
-            data = json.load(f)
-        # Add new offer IDs to the notified list (avoid duplicates)
-        existing_notified = set(data.get("notified_offers", []))
-        existing_notified.update(offer_ids)
-        data["notified_offers"] = list(existing_notified)
-        with open(DB_OFFERS_CACHE, "w") as f:
-            json.dump(data, f)
-    except:
-        pass
+    if _use_sqlite():
+        return sqlite_store.mark_offers_as_notified(offer_ids)
+    with _lock:
+        if DB_OFFERS_CACHE not in _pending and not os.path.exists(DB_OFFERS_CACHE):
+            return
+        try:
+            data = _load_json(DB_OFFERS_CACHE)
+            # Add new offer IDs to the notified list (avoid duplicates)
+            existing_notified = set(data.get("notified_offers", []))
+            existing_notified.update(offer_ids)
+            data["notified_offers"] = list(existing_notified)
+            _store_json(DB_OFFERS_CACHE, data)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to update {DB_OFFERS_CACHE}: {e}")
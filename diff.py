@@ -0,0 +1,111 @@
+"""
+Snapshot diff of offers.
+
+Compares the previous offers snapshot with a new scan in one pass: each
+offer is looked up by its identity key (the slot ID: discipline, date and
+time) and compared by its content key (the price). The result lists the
+added, removed and price-changed offers, and the notification policy says
+which of those kinds are worth an alert.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from models import Offer
+
+ADDED = "added"
+REMOVED = "removed"
+PRICE_DROP = "price_drop"
+PRICE_RISE = "price_rise"
+
+# Which changes are sent to subscribers. A slot that gets cheaper is the
+# alert that matters most; rises and offers that go away are only logged.
+NOTIFY_POLICY: Dict[str, bool] = {
+    ADDED: True,
+    PRICE_DROP: True,
+    PRICE_RISE: False,
+    REMOVED: False,
+}
+
+
+class Change(NamedTuple):
+    kind: str
+    offer: Offer
+    # The offer as it was in the previous snapshot (price changes, removals)
+    previous: Optional[Offer] = None
+
+    @property
+    def notify(self) -> bool:
+        return NOTIFY_POLICY.get(self.kind, False)
+
+
+def content_key(offer: Offer) -> int:
+    return offer.cents
+
+
+def alert_key(offer: Offer) -> str:
+    """Identity plus content: the same slot at a new price is a new alert."""
+    return f"{offer.id}@{content_key(offer)}"
+
+
+class SnapshotDiff:
+    __slots__ = ("added", "removed", "changed", "unchanged")
+
+    def __init__(self):
+        self.added: List[Change] = []
+        self.removed: List[Change] = []
+        self.changed: List[Change] = []
+        self.unchanged = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def changes(self) -> List[Change]:
+        return self.added + self.changed + self.removed
+
+    def to_notify(self) -> List[Change]:
+        """Changes the policy alerts on: new offers first, then price changes."""
+        return [change for change in self.added + self.changed if change.notify]
+
+    def summary(self) -> str:
+        drops = sum(1 for change in self.changed if change.kind == PRICE_DROP)
+        return (
+            f"+{len(self.added)} new, -{len(self.removed)} gone, "
+            f"{drops} cheaper, {len(self.changed) - drops} dearer, "
+            f"{self.unchanged} unchanged"
+        )
+
+
+def diff_offers(
+    previous: Iterable[Offer],
+    current: Iterable[Offer],
+    notified: Optional[Set[str]] = None,
+) -> SnapshotDiff:
+    """
+    Diffs two snapshots in O(n + m). Offers whose ID is in `notified` are
+    not reported as added again (an alert queued before the snapshot that
+    contains them was saved).
+    """
+    before: Dict[str, Offer] = {offer.id: offer for offer in previous}
+    result = SnapshotDiff()
+    seen: Set[str] = set()
+    for offer in current:
+        if offer.id in seen:
+            continue
+        seen.add(offer.id)
+        old = before.get(offer.id)
+        if old is None:
+            if notified is None or offer.id not in notified:
+                result.added.append(Change(ADDED, offer))
+            else:
+                result.unchanged += 1
+        elif content_key(offer) < content_key(old):
+            result.changed.append(Change(PRICE_DROP, offer, old))
+        elif content_key(offer) > content_key(old):
+            result.changed.append(Change(PRICE_RISE, offer, old))
+        else:
+            result.unchanged += 1
+    result.removed = [
+        Change(REMOVED, old, old)
+        for offer_id, old in before.items()
+        if offer_id not in seen
+    ]
+    return result
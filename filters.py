@@ -0,0 +1,262 @@
+import html
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from models import Offer, as_offer
+
+# Spanish weekday abbreviations used by /filter (Monday=0, like date.weekday())
+WEEKDAYS = ["lun", "mar", "mie", "jue", "vie", "sab", "dom"]
+_WEEKDAY_ALIASES = {"mié": "mie", "sáb": "sab"}
+
+FILTER_USAGE = (
+    "Uso: <code>/filter disciplina=enduro,trial dias=sab,dom horas=9-13 "
+    "desde=2026-03-01 hasta=2026-04-30 max=80</code>\n"
+    "Todos los campos son opcionales. <code>/filter off</code> elimina el filtro."
+)
+
+
+class OfferFilter:
+    """What a subscriber wants to be alerted about. None means "any"."""
+
+    __slots__ = (
+        "disciplines",
+        "weekdays",
+        "hour_from",
+        "hour_to",
+        "date_from",
+        "date_to",
+        "max_price",
+    )
+
+    def __init__(
+        self,
+        disciplines: Optional[Set[str]] = None,
+        weekdays: Optional[Set[int]] = None,
+        hour_from: Optional[int] = None,
+        hour_to: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        max_price: Optional[int] = None,
+    ):
+        self.disciplines = disciplines
+        self.weekdays = weekdays
+        self.hour_from = hour_from
+        self.hour_to = hour_to
+        self.date_from = date_from
+        self.date_to = date_to
+        self.max_price = max_price
+
+    @classmethod
+    def parse(cls, args: Iterable[str]) -> "OfferFilter":
+        """Builds a filter from /filter arguments. Raises ValueError on bad input."""
+        result = cls()
+        for arg in args:
+            key, sep, value = arg.partition("=")
+            key, value = key.strip().lower(), value.strip().lower()
+            if not sep or not value:
+                raise ValueError(f"Argumento no válido: {html.escape(arg)}")
+            if key == "disciplina":
+                result.disciplines = {v.strip() for v in value.split(",")} - {""}
+            elif key == "dias":
+                result.weekdays = {_parse_weekday(v) for v in value.split(",")}
+            elif key == "horas":
+                start, _, end = value.partition("-")
+                low, high = _parse_hour(start), _parse_hour(end or start)
+                result.hour_from, result.hour_to = min(low, high), max(low, high)
+            elif key == "desde":
+                result.date_from = _parse_date(value)
+            elif key == "hasta":
+                result.date_to = _parse_date(value)
+            elif key == "max":
+                result.max_price = _parse_price(value)
+            else:
+                raise ValueError(f"Campo desconocido: {html.escape(key)}")
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "OfferFilter":
+        return cls(
+            disciplines=set(data.get("disciplines") or ()) or None,
+            weekdays=set(data.get("weekdays") or ()) or None,
+            hour_from=data.get("hour_from"),
+            hour_to=data.get("hour_to"),
+            date_from=_optional_date(data.get("date_from")),
+            date_to=_optional_date(data.get("date_to")),
+            max_price=data.get("max_price"),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "disciplines": sorted(self.disciplines) if self.disciplines else None,
+            "weekdays": sorted(self.weekdays) if self.weekdays else None,
+            "hour_from": self.hour_from,
+            "hour_to": self.hour_to,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "max_price": self.max_price,
+        }
+
+    def matches_details(self, facts: "OfferFacts") -> bool:
+        """Checks the fields the index does not cover (hour, date window, price)."""
+        if self.hour_from is not None and (
+            facts.hour is None or not self.hour_from <= facts.hour <= self.hour_to
+        ):
+            return False
+        if self.date_from is not None or self.date_to is not None:
+            if facts.day is None:
+                return False
+            if self.date_from is not None and facts.day < self.date_from:
+                return False
+            if self.date_to is not None and facts.day > self.date_to:
+                return False
+        # In cents: a 49.50€ slot, shown as "50€", is over max=49
+        if self.max_price is not None and facts.cents > self.max_price * 100:
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.disciplines:
+            disciplines = ", ".join(sorted(self.disciplines))
+            parts.append(f"🏍️ {html.escape(disciplines)}")
+        if self.weekdays:
+            days = ", ".join(WEEKDAYS[d] for d in sorted(self.weekdays))
+            parts.append(f"📅 {days}")
+        if self.hour_from is not None:
+            parts.append(f"🕘 {self.hour_from}:00-{self.hour_to}:00")
+        if self.date_from or self.date_to:
+            start = self.date_from.isoformat() if self.date_from else "…"
+            end = self.date_to.isoformat() if self.date_to else "…"
+            parts.append(f"🗓️ {start} → {end}")
+        if self.max_price is not None:
+            parts.append(f"💰 ≤ {self.max_price}€")
+        return "\n".join(parts) if parts else "Todas las ofertas"
+
+
+class OfferFacts:
+    """Offer fields in comparable form, computed once per offer per scan."""
+
+    __slots__ = ("discipline", "day", "weekday", "hour", "cents")
+
+    def __init__(self, offer: Union[Offer, Dict]):
+        offer = as_offer(offer)
+        self.discipline = offer.discipline.lower()
+        self.day = offer.day
+        self.weekday = self.day.weekday() if self.day else None
+        self.hour = offer.hour
+        self.cents = offer.cents
+
+
+class FilterIndex:
+    """
+    Inverted index from discipline and weekday to subscribers.
+
+    For each offer the candidates come from two set lookups; only those
+    candidates get the remaining per-filter checks. Subscribers without
+    a filter skip the index entirely and receive every offer.
+    """
+
+    def __init__(self, users: Iterable[int], filters: Dict[int, OfferFilter]):
+        self.filters = filters
+        self.unfiltered: Set[int] = set()
+        self.by_discipline: Dict[str, Set[int]] = {}
+        self.any_discipline: Set[int] = set()
+        self.by_weekday: Dict[int, Set[int]] = {}
+        self.any_weekday: Set[int] = set()
+
+        for user_id in users:
+            offer_filter = filters.get(user_id)
+            if offer_filter is None:
+                self.unfiltered.add(user_id)
+                continue
+            if offer_filter.disciplines:
+                for discipline in offer_filter.disciplines:
+                    self.by_discipline.setdefault(discipline, set()).add(user_id)
+            else:
+                self.any_discipline.add(user_id)
+            if offer_filter.weekdays:
+                for weekday in offer_filter.weekdays:
+                    self.by_weekday.setdefault(weekday, set()).add(user_id)
+            else:
+                self.any_weekday.add(user_id)
+
+    def filtered_recipients(self, facts: OfferFacts) -> Set[int]:
+        """Subscribers with a filter that accepts the offer."""
+        candidates = self.any_discipline
+        by_discipline = self.by_discipline.get(facts.discipline)
+        if by_discipline:
+            candidates = by_discipline | candidates
+        if not candidates:
+            return set()
+        by_weekday = self.by_weekday.get(facts.weekday)
+        candidates = candidates & (
+            by_weekday | self.any_weekday if by_weekday else self.any_weekday
+        )
+        return {
+            user_id
+            for user_id in candidates
+            if self.filters[user_id].matches_details(facts)
+        }
+
+    def fan_out(self, offers: List[Offer]) -> List[Tuple[List[Offer], Set[int]]]:
+        """
+        Groups subscribers by the exact list of offers they should get.
+        Each group needs one rendered message, however many users share it.
+        """
+        per_user: Dict[int, List[int]] = {}
+        for position, offer in enumerate(offers):
+            for user_id in self.filtered_recipients(OfferFacts(offer)):
+                per_user.setdefault(user_id, []).append(position)
+
+        groups: Dict[Tuple[int, ...], Set[int]] = {}
+        if self.unfiltered and offers:
+            groups[tuple(range(len(offers)))] = set(self.unfiltered)
+        for user_id, positions in per_user.items():
+            groups.setdefault(tuple(positions), set()).add(user_id)
+
+        return [
+            ([offers[position] for position in positions], user_ids)
+            for positions, user_ids in groups.items()
+        ]
+
+
+def _parse_weekday(value: str) -> int:
+    value = value.strip()
+    value = _WEEKDAY_ALIASES.get(value, value)[:3]
+    if value not in WEEKDAYS:
+        raise ValueError(f"Día no válido: {html.escape(value)}")
+    return WEEKDAYS.index(value)
+
+
+def _parse_hour(value: str) -> int:
+    value = value.strip()
+    if not value.isdigit() or int(value) > 23:
+        raise ValueError(f"Hora no válida: {html.escape(value)} (de 0 a 23)")
+    return int(value)
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(
+            f"Fecha no válida: {html.escape(value)} (formato AAAA-MM-DD)"
+        ) from None
+
+
+def _parse_price(value: str) -> int:
+    value = value.rstrip("€").strip()
+    if not value.isdigit():
+        raise ValueError(
+            f"Precio no válido: {html.escape(value)} (euros, sin decimales)"
+        )
+    return int(value)
+
+
+def _optional_date(value) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
@@ -0,0 +1,207 @@
+"""
+Append-only history of the offers seen by the scanner.
+
+Each scan appends one JSON line with only what changed since the previous
+snapshot. Files are split by month (data/history/YYYY-MM.jsonl) and each
+one starts with a keyframe, so any segment can be read on its own and old
+months can be archived or dropped without touching the rest.
+
+Record formats (t = unix time, prices in cents of the real price):
+    {"t": 1760000000, "k": {"<offer id>": 6000, ...}}            keyframe
+    {"t": 1760000060, "a": {id: cents}, "r": [id], "c": {id: cents}}  delta
+"""
+import json
+import logging
+import mmap
+import os
+import time
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+from models import Offer
+
+logger = logging.getLogger("History")
+
+HISTORY_DIR = os.path.join(database.DB_PATH, "history")
+
+
+def _price_cents(offer: Dict) -> Optional[int]:
+    if isinstance(offer, Offer):
+        return offer.cents
+    try:
+        return int(offer.get("price", "").rstrip("€")) * 100
+    except ValueError:
+        return None
+
+
+def _segment_name(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m") + ".jsonl"
+
+
+class HistoryLog:
+    """Writes and queries the monthly delta segments."""
+
+    def __init__(self, directory: str = HISTORY_DIR):
+        self.directory = directory
+        self._snapshot: Optional[Dict[str, Optional[int]]] = None
+        self._segment: Optional[str] = None
+
+    # Writing
+
+    def reload(self) -> None:
+        """Forgets the cached snapshot; the next record reads it from disk."""
+        self._snapshot, self._segment = None, None
+
+    def record(self, offers: List[Dict], timestamp: Optional[float] = None) -> bool:
+        """Appends the diff against the previous scan; False if nothing changed."""
+        timestamp = time.time() if timestamp is None else timestamp
+        current = {database.offer_id(offer): _price_cents(offer) for offer in offers}
+        if self._snapshot is None:
+            self._snapshot = self._latest_snapshot()
+
+        segment = _segment_name(timestamp)
+        if segment != self._segment and not os.path.exists(self._path(segment)):
+            self._append(segment, {"t": int(timestamp), "k": current})
+            self._snapshot, self._segment = current, segment
+            return True
+        self._segment = segment
+
+        added = {k: v for k, v in current.items() if k not in self._snapshot}
+        removed = [k for k in self._snapshot if k not in current]
+        changed = {
+            k: v
+            for k, v in current.items()
+            if k in self._snapshot and self._snapshot[k] != v
+        }
+        if not (added or removed or changed):
+            return False
+
+        record = {"t": int(timestamp)}
+        if added:
+            record["a"] = added
+        if removed:
+            record["r"] = removed
+        if changed:
+            record["c"] = changed
+        self._append(segment, record)
+        self._snapshot = current
+        return True
+
+    def _append(self, segment: str, record: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(segment), "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _latest_snapshot(self) -> Dict[str, Optional[int]]:
+        segments = self.segments()
+        if not segments:
+            return {}
+        snapshot: Dict[str, Optional[int]] = {}
+        for _, snapshot, _ in self._replay(segments[-1:]):
+            pass
+        self._segment = segments[-1]
+        return dict(snapshot)
+
+    # Reading
+
+    def _path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment)
+
+    def segments(self, since: Optional[date] = None) -> List[str]:
+        """Segment file names in time order, optionally from a month on."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(".jsonl"))
+        if since is not None:
+            names = [n for n in names if n >= since.strftime("%Y-%m")]
+        return names
+
+    def _records(self, segment: str) -> Iterator[Dict]:
+        path = self._path(segment)
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn last line after a crash
+                        logger.warning(f"Skipping unreadable record in {segment}")
+
+    def _replay(self, segments: List[str]):
+        """
+        Yields (timestamp, snapshot, events) per record, where events are
+        (kind, offer_id, cents) with kind "added", "removed" or "changed".
+        Keyframes are diffed against the running snapshot like deltas.
+        """
+        snapshot: Dict[str, Optional[int]] = {}
+        for segment in segments:
+            for record in self._records(segment):
+                timestamp = record["t"]
+                events = []
+                if "k" in record:
+                    keyframe = record["k"]
+                    added = {k: v for k, v in keyframe.items() if k not in snapshot}
+                    removed = [k for k in snapshot if k not in keyframe]
+                    changed = {
+                        k: v
+                        for k, v in keyframe.items()
+                        if k in snapshot and snapshot[k] != v
+                    }
+                else:
+                    added = record.get("a", {})
+                    removed = record.get("r", [])
+                    changed = record.get("c", {})
+                for offer_id, cents in added.items():
+                    snapshot[offer_id] = cents
+                    events.append(("added", offer_id, cents))
+                for offer_id in removed:
+                    snapshot.pop(offer_id, None)
+                    events.append(("removed", offer_id, None))
+                for offer_id, cents in changed.items():
+                    snapshot[offer_id] = cents
+                    events.append(("changed", offer_id, cents))
+                yield timestamp, snapshot, events
+
+    # Queries
+
+    def price_history(
+        self, offer_id: str, since: Optional[date] = None
+    ) -> List[Tuple[int, Optional[int]]]:
+        """(timestamp, cents) each time a slot appears or changes; None when it goes."""
+        return [
+            (timestamp, cents)
+            for timestamp, _, events in self._replay(self.segments(since))
+            for kind, event_id, cents in events
+            if event_id == offer_id
+        ]
+
+    def lifetimes(self, since: Optional[date] = None) -> List[Tuple[str, int, int]]:
+        """(offer id, appeared at, disappeared at) for every offer that is gone."""
+        appeared: Dict[str, int] = {}
+        result = []
+        for timestamp, _, events in self._replay(self.segments(since)):
+            for kind, offer_id, _ in events:
+                if kind == "added":
+                    appeared[offer_id] = timestamp
+                elif kind == "removed" and offer_id in appeared:
+                    result.append((offer_id, appeared.pop(offer_id), timestamp))
+        return result
+
+    def drop_times(self, since: Optional[date] = None) -> Counter:
+        """How many offers appeared at each (weekday, hour), Monday=0, local time."""
+        counts: Counter = Counter()
+        first = True
+        for timestamp, _, events in self._replay(self.segments(since)):
+            if first:
+                # The first keyframe is what existed before tracking started
+                first = False
+                continue
+            moment = datetime.fromtimestamp(timestamp)
+            for kind, _, _ in events:
+                if kind == "added":
+                    counts[(moment.weekday(), moment.hour)] += 1
+        return counts
@@ -0,0 +1,162 @@
+"""
+Leader election for running several bot replicas on shared storage.
+
+Every replica serves commands and sends the alerts of its share of the
+chats (abs(chat_id) % REPLICA_COUNT == REPLICA_INDEX, see outbox.py).
+Only the replica holding the "scanner" lease scrapes the page and queues
+alerts.
+
+The lease is one SQLite row with its holder and expiry time. The leader
+renews it every RENEW_SECONDS; when it stops renewing (crash, hang,
+network split from the disk), another replica takes over once the lease
+expires. SQLite locking only works on a local disk or a shared volume
+of one host, which is what the replicas are meant to share.
+"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Awaitable, Callable, Optional
+
+import database
+import sqlite_store
+
+logger = logging.getLogger("Leader")
+
+LEASE_PATH = os.path.join(database.DB_PATH, "leader.sqlite3")
+LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+# Renewed a few times per lease, so one slow renewal does not lose it
+RENEW_SECONDS = LEASE_SECONDS / 3
+
+# This replica's share of the chats, and how many replicas there are
+REPLICA_INDEX = int(os.getenv("REPLICA_INDEX", "0"))
+REPLICA_COUNT = int(os.getenv("REPLICA_COUNT", "1"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class Lease:
+    """A named, expiring lock in SQLite. Blocking: call it from a thread."""
+
+    def __init__(
+        self,
+        name: str = "scanner",
+        holder: Optional[str] = None,
+        path: str = LEASE_PATH,
+        ttl: float = LEASE_SECONDS,
+    ):
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}-{os.getpid()}"
+        self.path = path
+        self.ttl = ttl
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite_store.connect(self.path, _SCHEMA)
+
+    def acquire(self) -> bool:
+        """Takes or renews the lease; False while another holder has it."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT holder, expires FROM leases WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is not None and row[0] != self.holder and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, holder, expires) "
+                "VALUES (?, ?, ?)",
+                (self.name, self.holder, now + self.ttl),
+            )
+        return True
+
+    def release(self) -> None:
+        """Gives the lease up right away (clean shutdown), if we hold it."""
+        self._connect().execute(
+            "DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder)
+        )
+
+    def current_holder(self) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT holder FROM leases WHERE name = ? AND expires > ?",
+            (self.name, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+
+class LeaderElection:
+    """
+    Keeps trying to hold `lease` in the background. `on_elected` and
+    `on_demoted` are awaited when this replica gains or loses it.
+    """
+
+    def __init__(
+        self,
+        lease: Lease,
+        on_elected: Callable[[], Awaitable],
+        on_demoted: Callable[[], Awaitable],
+        renew_seconds: float = RENEW_SECONDS,
+    ):
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.renew_seconds = renew_seconds
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self) -> None:
+        try:
+            held = await asyncio.to_thread(self.lease.acquire)
+        except sqlite3.Error as e:
+            # Can't tell whether the lease still holds: act as if it was lost
+            logger.error(f"❌ Lease renewal failed: {e}")
+            held = False
+        if held and not self.is_leader:
+            logger.info(f"👑 {self.lease.holder} is now the scanning leader")
+            try:
+                await self.on_elected()
+            except Exception:
+                # Not scanning: let the next step, or another replica, retry
+                await asyncio.to_thread(self.lease.release)
+                raise
+            self.is_leader = True
+        elif not held and self.is_leader:
+            self.is_leader = False
+            logger.warning(f"🪑 {self.lease.holder} lost the lease, now a follower")
+            await self.on_demoted()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._step()
+            except Exception as e:
+                logger.error(f"❌ Leader election step failed: {e}")
+            await asyncio.sleep(self.renew_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops campaigning and hands the lease over without waiting for expiry."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            await self.on_demoted()
+            await asyncio.to_thread(self.lease.release)
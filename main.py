@@ -1,168 +1,121 @@
+"""
+Command line entry point.
+
+    python main.py [serve]        run the Telegram bot (the default)
+    python main.py scan-once      scan the page once and print the offers as JSON
+    python main.py dump-cache     print the cached offers and notified IDs as JSON
+    python main.py replay DIR     replay recorded page captures (see replay.py)
+
+Only `serve` needs BOT_TOKEN and loads python-telegram-bot; the other
+commands import just what they use, so they start quickly and can be run
+from cron or any other scheduler.
+"""
+import argparse
+import json
 import logging
-import os
-import aiocron
+import sys
+
 from dotenv import load_dotenv
 
-# Importaciones de la BASE de la librería
-from telegram import BotCommand, Update
 
-# Importaciones de las EXTENSIONES
-from telegram.ext import (
-    ApplicationBuilder,
-    CommandHandler,
-    ContextTypes,
-)
+def serve(args: argparse.Namespace) -> None:
+    import bot
 
-import scraper
-import database
+    bot.run()
 
-load_dotenv()
 
-REFRESH_INTERVAL_MINUTES = 1
-VERSION_RELEASE = "1.2.1"
+def scan_once(args: argparse.Namespace) -> None:
+    import asyncio
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger("Main")
+    import scraper
 
-TOKEN = os.getenv("BOT_TOKEN")
+    async def scan():
+        try:
+            return await scraper.get_new_offers_async(urls=args.url)
+        finally:
+            await scraper.close_async_client()
 
-if not TOKEN:
-    logger.error("Error: BOT_TOKEN not found in environment variables.")
-    exit(1)
+    items, date_range = asyncio.run(scan())
+    if date_range in scraper.SCAN_ERRORS:
+        print(f"❌ Scan failed: {date_range}", file=sys.stderr)
+        sys.exit(1)
+    if not args.all:
+        items = [item for item in items if item.is_offer]
+    _print_json(
+        {"date_range": date_range, "offers": [item.to_dict() for item in items]}
+    )
 
-# Global application instance
-app = None
 
+def dump_cache(args: argparse.Namespace) -> None:
+    import database
 
-def generate_offer_id(offer):
-    """Generate a unique ID for an offer based on its details."""
-    return (
-        f"{offer.get('discipline', '')}_{offer.get('date', '')}_{offer.get('time', '')}"
+    # Read-only: inspecting the data must not create or migrate it
+    offers, date_range, notified, users = database.read_snapshot()
+    _print_json(
+        {
+            "backend": database.DB_BACKEND,
+            "date_range": date_range,
+            "users": users,
+            "offers": [offer.to_dict() for offer in offers],
+            "notified": sorted(notified),
+        }
     )
 
 
-@aiocron.crontab(f"*/{REFRESH_INTERVAL_MINUTES} * * * *")
-async def scheduled_scan():
-    logger.info("Cron: Scanning for new offers...")
-    all_items, date_range = scraper.get_new_offers()
-
-    # Filter only offers (is_offer == True)
-    offers = [item for item in all_items if item.get("is_offer", False)]
-
-    # Load previously notified offers
-    _, _, notified_offer_ids = database.load_cached_offers()
-
-    # Find new offers that haven't been notified yet
-    new_offers = []
-    new_offer_ids = []
-    for offer in offers:
-        offer_id = generate_offer_id(offer)
-        if offer_id not in notified_offer_ids:
-            new_offers.append(offer)
-            new_offer_ids.append(offer_id)
-
-    # Save all offers (for the /offers command)
-    database.save_offers(offers, date_range)
-
-    # Send notifications only for NEW offers
-    if new_offers:
-        logger.info(f"Found {len(new_offers)} new offers to notify")
-        users = database.get_users()
-        text = scraper.format_offer_message(new_offers)
-        
-        for user_id in users:
-            try:
-                await app.bot.send_message(
-                    chat_id=user_id, text=text, parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(f"Error sending message to {user_id}: {e}")
-                
-        database.mark_offers_as_notified(new_offer_ids)
-    else:
-        logger.info("Cron: No new offers found.")
-
-
-async def offers_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_chat.id
-    logger.info(f"User {user_id} requested offers from database.")
-
-    users = database.get_users()
-    if user_id not in users:
-        database.add_user(user_id)
-        logger.info(f"Usuario {user_id} auto-suscrito al usar /offers")
-
-        await update.message.reply_text(
-            "✅ <i>He notado que no estabas en la lista de alertas. Te he suscrito automáticamente. Usa /stop si no quieres recibir avisos.</i>",
-            parse_mode="HTML",
-        )
+def replay_captures(args: argparse.Namespace) -> None:
+    import replay
 
-    current_offers, date_range, _ = database.load_cached_offers()
+    # The harness owns its arguments; it is only imported when used
+    parser = argparse.ArgumentParser(prog="main.py replay")
+    replay.add_arguments(parser)
+    replay.main(parser.parse_args(args.extra))
 
-    logger.info(f"Loaded {len(current_offers)} current/future offers from cache")
-    for offer in current_offers:
-        logger.info(
-            f"  - {offer.get('date')} {offer.get('time')} - {offer.get('discipline')}"
-        )
 
-    text = scraper.format_offer_message(current_offers)
-    await update.message.reply_text(text, parse_mode="HTML")
+def _print_json(data) -> None:
+    json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
 
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_chat.id
-    database.add_user(user_id)
-    await update.message.reply_text(
-        f"✅ <b>¡Suscrito correctamente!</b> Te avisaré cuando detecte nuevas ofertas.\n\n"
-        f"<i>Bot version: {VERSION_RELEASE}</i>",
-        parse_mode="HTML",
-    )
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pol Ferrer Academy offers bot")
+    commands = parser.add_subparsers(dest="command")
 
+    commands.add_parser("serve", help="run the Telegram bot (default)")
 
-async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_chat.id
-    database.remove_user(user_id)
-    await update.message.reply_text(
-        "🔕 <b>Suscripción cancelada.</b> Ya no recibirás más alertas.",
-        parse_mode="HTML",
+    scan = commands.add_parser("scan-once", help="scan once and print JSON")
+    scan.add_argument(
+        "--url", action="append", help="page to scan, repeatable (default: SCAN_URLS)"
     )
-
-
-async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    help_text = (
-        "🤖 <b>Pol Academy Offers Hunter</b>\n\n"
-        f"Este bot escanea la academia de Pol Ferrer cada {REFRESH_INTERVAL_MINUTES} minutos buscando ofertas.\n\n"
-        "<b>Comandos disponibles:</b>\n"
-        "• /start - Suscribirse a las alertas automáticas.\n"
-        "• /offers - Ver las ofertas activas actualmente.\n"
-        "• /stop - Dejar de recibir notificaciones.\n"
-        "• /help - Mostrar este mensaje de ayuda.\n\n"
-        f"<i>Version: {VERSION_RELEASE}</i>"
+    scan.add_argument(
+        "--all", action="store_true", help="include slots that are not offers"
     )
-    await update.message.reply_text(help_text, parse_mode="HTML")
 
+    commands.add_parser("dump-cache", help="print the cached offers as JSON")
 
-async def post_init(application):
-    """Configure bot commands after the application has been initialized."""
-    commands = [
-        BotCommand("start", "Suscribirse a las alertas"),
-        BotCommand("offers", "Ver ofertas actuales"),
-        BotCommand("stop", "Cancelar suscripción"),
-        BotCommand("help", "Información del bot"),
-    ]
-    await application.bot.set_my_commands(commands)
-    logger.info("✅ Commands set successfully.")
+    # Its arguments, --help included, are parsed by replay.py itself
+    commands.add_parser("replay", help="replay recorded captures", add_help=False)
+    return parser
 
 
-if __name__ == "__main__":
-    app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
+COMMANDS = {
+    None: serve,
+    "serve": serve,
+    "scan-once": scan_once,
+    "dump-cache": dump_cache,
+    "replay": replay_captures,
+}
 
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("stop", stop))
-    app.add_handler(CommandHandler("offers", offers_cmd))
-    app.add_handler(CommandHandler("help", help_cmd))
 
-    logger.info("\Starting Offers Hunter Bot...")
-    app.run_polling()
+if __name__ == "__main__":
+    load_dotenv()
+    parser = build_parser()
+    args, extra = parser.parse_known_args()
+    args.extra = extra
+    if extra and args.command != "replay":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command not in (None, "serve"):
+        # Logs to stderr, keeping stdout for the JSON
+        logging.basicConfig(
+            level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s"
+        )
+    COMMANDS[args.command](args)
@@ -0,0 +1,249 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Recording is a few integer/float updates with no locks or I/O (the bot
+updates them from its event loop); the text is only built when something
+requests /metrics from the local HTTP endpoint started by serve().
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger("Metrics")
+
+# Seconds, from sub-millisecond parsing to slow Telegram sends
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+SIZE_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024**2, 4 * 1024**2)
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        # Children (one per label combination) are rendered by their parent
+        if help_text:
+            _registry.append(self)
+
+    def labels(self, *values: str):
+        """The child series for these label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def _child(self) -> "_Metric":
+        return type(self)(self.name, "")
+
+    def _series(self) -> Iterator[Tuple[str, "_Metric"]]:
+        if not self.label_names:
+            yield "", self
+            return
+        for values, child in self._children.items():
+            pairs = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.label_names, values)
+            )
+            yield pairs, child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for labels, series in self._series():
+            lines.extend(series._samples(labels))
+        return lines
+
+    def _samples(self, labels: str) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def _samples(self, labels: str) -> List[str]:
+        return [f"{self.name}_total{_braces(labels)} {_number(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def _samples(self, labels: str) -> List[str]:
+        return [f"{self.name}{_braces(labels)} {_number(self.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, "", buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        # Counts are per bucket; they are made cumulative only when rendered
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observes the seconds spent in the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def _samples(self, labels: str) -> List[str]:
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{{{prefix}le="{_number(bound)}"}} {cumulative}'
+            )
+        cumulative += self._counts[-1]
+        lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum{_braces(labels)} {_number(self.sum)}")
+        lines.append(f"{self.name}_count{_braces(labels)} {cumulative}")
+        return lines
+
+
+def _braces(labels: str) -> str:
+    return f"{{{labels}}}" if labels else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Scan pipeline
+FETCH_SECONDS = Histogram(
+    "offers_fetch_seconds",
+    "Time to download the offers page, by result (ok, not_modified, error).",
+    ["result"],
+)
+FETCH_BYTES = Histogram(
+    "offers_fetch_bytes", "Bytes downloaded per scan.", buckets=SIZE_BUCKETS
+)
+EXTRACT_SECONDS = Histogram(
+    "offers_extract_seconds", "Time spent finding the data blocks in the page."
+)
+PARSE_SECONDS = Histogram(
+    "offers_parse_seconds", "Time spent decoding and processing the offers."
+)
+OFFERS_SEEN = Counter("offers_seen", "Offers found on the page, per scan.")
+NEW_OFFERS = Counter("offers_new", "Offers that had not been notified yet.")
+
+# Storage
+DB_READ_SECONDS = Histogram("db_read_seconds", "Database read time.", ["operation"])
+DB_WRITE_SECONDS = Histogram("db_write_seconds", "Database write time.", ["operation"])
+
+# Telegram
+SEND_SECONDS = Histogram(
+    "telegram_send_seconds", "Latency of each send_message call."
+)
+SEND_FAILURES = Counter(
+    "telegram_send_failures", "Messages that could not be delivered."
+)
+RATE_LIMITED = Counter("telegram_rate_limited", "429 RetryAfter responses.")
+BROADCAST_QUEUE = Gauge("broadcast_queue_depth", "Messages waiting to be sent.")
+
+
+# HTTP endpoint
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain the headers; nothing in them matters here
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (
+            b"\r\n",
+            b"\n",
+            b"",
+        ):
+            pass
+        parts = request.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) >= 2 else ""
+        if parts and parts[0] == "GET" and path == "/metrics":
+            status, content_type = "200 OK", "text/plain; version=0.0.4"
+            body = render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 9108):
+    """Starts the /metrics endpoint on the running loop; None if the port is taken."""
+    try:
+        server = await asyncio.start_server(_handle, host, port)
+    except OSError as e:
+        logger.error(f"❌ Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    logger.info(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return server
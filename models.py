@@ -0,0 +1,239 @@
+"""
+Offer model shared by the scraper, the stores and the bot state.
+
+An Offer keeps its fields in comparable form (date ordinal, hour, integer
+cents) and builds its ID once. It still answers offer["date"] and
+offer.get("price") with the formatted strings the rest of the code and
+the JSON cache use, so it can stand in for the old offer dicts.
+"""
+import sys
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Sort position of offers whose date could not be parsed: kept, after the rest
+UNKNOWN_ORDINAL = sys.maxsize
+
+
+class Offer:
+    __slots__ = (
+        "id",
+        "discipline",
+        "ordinal",
+        "hour",
+        "minute",
+        "cents",
+        "is_offer",
+        "original_date",
+        "base_cents",
+        "discount",
+        "date",
+        "time",
+    )
+
+    def __init__(
+        self,
+        discipline: str,
+        ordinal: Optional[int],
+        hour: Optional[int],
+        cents: int,
+        minute: int = 0,
+        is_offer: bool = True,
+        original_date: str = "",
+        date_text: Optional[str] = None,
+    ):
+        # Few distinct disciplines across thousands of offers: share the strings
+        self.discipline = sys.intern(discipline)
+        self.ordinal = ordinal
+        self.hour = hour
+        self.minute = minute
+        # Real price (the page shows the deposit, half of it)
+        self.cents = cents
+        self.is_offer = is_offer
+        self.original_date = original_date
+        self.base_cents: Optional[int] = None
+        self.discount: Optional[int] = None
+        # Display forms, built once; date_text is what came when unparseable
+        if ordinal is None:
+            self.date = date_text or ""
+        else:
+            self.date = date.fromordinal(ordinal).isoformat()
+        self.time = "??" if hour is None else f"{hour:02d}:{minute:02d}"
+        self.id = f"{self.discipline}_{self.date}_{self.time}"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Offer":
+        """
+        Reads an offer in the cached dict format. Caches written before
+        "cents" was stored only have the rounded price, parsed back here.
+        """
+        date_text = data.get("date", "")
+        try:
+            ordinal = date.fromisoformat(date_text).toordinal()
+        except (ValueError, TypeError):
+            ordinal = None
+        hour, minute = _parse_time(data.get("time", ""))
+        offer = cls(
+            data.get("discipline", ""),
+            ordinal,
+            hour,
+            _stored_cents(data, "cents", "price") or 0,
+            minute=minute,
+            is_offer=data.get("is_offer", True),
+            original_date=data.get("original_date", ""),
+            date_text=None if ordinal is not None else date_text,
+        )
+        offer.base_cents = _stored_cents(data, "base_cents", "base_price")
+        offer.discount = data.get("discount")
+        return offer
+
+    # Comparable fields
+
+    @property
+    def day(self) -> Optional[date]:
+        return date.fromordinal(self.ordinal) if self.ordinal is not None else None
+
+    @property
+    def sort_ordinal(self) -> int:
+        return self.ordinal if self.ordinal is not None else UNKNOWN_ORDINAL
+
+    def sort_key(self):
+        return (self.sort_ordinal, self.hour or 0, self.minute, self.discipline)
+
+    def is_current(self, today_ordinal: int) -> bool:
+        """From today on (offers with an unknown date are always kept)."""
+        return self.ordinal is None or self.ordinal >= today_ordinal
+
+    # Formatted fields, as in the old dicts
+
+    @property
+    def price(self) -> str:
+        return f"{self.cents / 100:.0f}€"
+
+    @property
+    def base_price(self) -> Optional[str]:
+        if self.base_cents is None:
+            return None
+        return f"{self.base_cents / 100:.0f}€"
+
+    def to_dict(self) -> Dict:
+        data = {
+            "is_offer": self.is_offer,
+            "discipline": self.discipline,
+            "date": self.date,
+            "time": self.time,
+            "price": self.price,
+            # Exact: the price above is rounded to whole euros
+            "cents": self.cents,
+            "original_date": self.original_date,
+        }
+        if self.base_cents is not None:
+            data["base_price"] = self.base_price
+            data["base_cents"] = self.base_cents
+            data["discount"] = self.discount
+        return data
+
+    # Read-only dict interface
+
+    def __getitem__(self, key: str):
+        if key not in _KEYS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in _OPTIONAL_KEYS:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Offer):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"Offer({self.id!r}, {self.price})"
+
+
+_KEYS = frozenset(
+    (
+        "is_offer",
+        "discipline",
+        "date",
+        "time",
+        "price",
+        "original_date",
+        "base_price",
+        "discount",
+    )
+)
+_OPTIONAL_KEYS = frozenset(("base_price", "discount"))
+
+
+def as_offer(offer: Union[Offer, Dict]) -> Offer:
+    return offer if isinstance(offer, Offer) else Offer.from_dict(offer)
+
+
+class SortedOffers:
+    """
+    Offers kept in date order, so the ones from past days are always a
+    prefix and dropping them is one bisect and one slice deletion.
+    """
+
+    __slots__ = ("offers", "_ordinals")
+
+    def __init__(self, offers: Iterable[Union[Offer, Dict]] = ()):
+        self.offers: List[Offer] = sorted(map(as_offer, offers), key=Offer.sort_key)
+        self._ordinals = [offer.sort_ordinal for offer in self.offers]
+
+    def _first_current(self, today: date) -> int:
+        return bisect_left(self._ordinals, today.toordinal())
+
+    def prune(self, today: date) -> int:
+        """Drops the offers before `today`; returns how many went."""
+        cut = self._first_current(today)
+        if cut:
+            del self.offers[:cut]
+            del self._ordinals[:cut]
+        return cut
+
+    def current(self, today: date) -> List[Offer]:
+        """Offers from `today` on, leaving the collection as it is."""
+        return self.offers[self._first_current(today) :]
+
+    def __iter__(self) -> Iterator[Offer]:
+        return iter(self.offers)
+
+    def __len__(self) -> int:
+        return len(self.offers)
+
+
+def _parse_time(value: str):
+    try:
+        hour, _, minute = value.partition(":")
+        return int(hour), int(minute or 0)
+    except (ValueError, AttributeError):
+        return None, 0
+
+
+def _stored_cents(data: Dict, cents_key: str, price_key: str) -> Optional[int]:
+    cents = data.get(cents_key)
+    if isinstance(cents, int):
+        return cents
+    return _parse_cents(data.get(price_key, ""))
+
+
+def _parse_cents(value) -> Optional[int]:
+    try:
+        return int(str(value).rstrip("€")) * 100
+    except ValueError:
+        return None
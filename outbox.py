@@ -0,0 +1,319 @@
+"""
+Durable outbox for offer alerts.
+
+Each alert is one row per (chat, offer batch), written before the offers
+are marked as notified. Workers lease rows, send them and acknowledge
+each delivery, so a restart resumes where it stopped: delivered rows are
+not sent again, and rows leased by a dead process become due when their
+lease expires. Transient failures are retried with exponential backoff.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import database
+import metrics
+import sqlite_store
+from broadcaster import MAX_CONCURRENCY, BroadcastReport, Broadcaster, telegram_errors
+
+logger = logging.getLogger("Outbox")
+
+OUTBOX_PATH = os.path.join(database.DB_PATH, "outbox.sqlite3")
+# Rows one worker takes at a time, and for how long they stay reserved
+CLAIM_SIZE = 10
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 6
+# Retry delays: 30s, 60s, 120s... capped at an hour
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+# Delivered and dead rows are kept this long. Queueing the same alert again
+# within it is skipped, which covers a crash between queueing the alerts and
+# saving the offers as notified; an offer that comes back later alerts again.
+RETENTION_SECONDS = 60 * 60
+# The sender looks for due retries at least this often
+IDLE_POLL_SECONDS = 30
+# With several replicas, rows of another replica's chats are left to it for
+# this long, then any replica sends them (that replica is probably down)
+ORPHAN_SECONDS = 60
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    offer_ids TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (batch_id, chat_id)
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+
+class Entry(NamedTuple):
+    id: int
+    chat_id: int
+    text: str
+    attempts: int
+
+
+def batch_id(offer_ids: Iterable[str]) -> str:
+    """Stable ID of a set of offers, so the same alert is only queued once."""
+    digest = hashlib.blake2b("\n".join(sorted(offer_ids)).encode(), digest_size=8)
+    return digest.hexdigest()
+
+
+def is_permanent(error: Optional[Exception]) -> bool:
+    """Blocked bot, deleted chat... failures that retrying will not fix."""
+    errors = telegram_errors()
+    return isinstance(error, (errors.BadRequest, errors.Forbidden))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class Outbox:
+    """SQLite (WAL) queue of pending alerts. Blocking: call it from a thread."""
+
+    def __init__(
+        self,
+        path: str = OUTBOX_PATH,
+        worker: Optional[str] = None,
+        partition: Tuple[int, int] = (0, 1),
+    ):
+        self.path = path
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        # (index, count): this process sends to chats with abs(chat_id) % count == index
+        self.partition = partition
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite_store.connect(self.path, _SCHEMA)
+
+    def enqueue(self, entries: Iterable[Tuple[int, str, List[str]]]) -> int:
+        """
+        Queues (chat_id, text, offer_ids) alerts in one transaction.
+        An alert still queued, or sent within RETENTION_SECONDS, for that
+        chat and batch is skipped.
+        Returns how many rows were added.
+        """
+        now = time.time()
+        rows = [
+            (batch_id(offer_ids), chat_id, text, json.dumps(offer_ids), now, now)
+            for chat_id, text, offer_ids in entries
+        ]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM outbox WHERE status != ? AND updated < ?",
+                (PENDING, now - RETENTION_SECONDS),
+            )
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox "
+                "(batch_id, chat_id, text, offer_ids, next_attempt, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = conn.total_changes - before
+            pending = _pending_count(conn)
+        metrics.BROADCAST_QUEUE.set(pending)
+        return added
+
+    def claim(self, limit: int = CLAIM_SIZE) -> List[Entry]:
+        """
+        Leases up to `limit` due rows of this worker's partition (or orphaned
+        rows of another one) to this worker.
+        """
+        now = time.time()
+        index, count = self.partition
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, chat_id, text, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt <= ? "
+                "AND (lease_until IS NULL OR lease_until < ?) "
+                "AND (abs(chat_id) % ? = ? OR next_attempt < ?) "
+                "ORDER BY id LIMIT ?",
+                (PENDING, now, now, count, index, now - ORPHAN_SECONDS, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET lease_until = ?, worker = ? WHERE id = ?",
+                ((now + LEASE_SECONDS, self.worker, row[0]) for row in rows),
+            )
+        return [Entry(*row) for row in rows]
+
+    def ack(self, entry_id: int) -> None:
+        """Marks a row as delivered."""
+        self._connect().execute(
+            "UPDATE outbox SET status = ?, lease_until = NULL, updated = ? "
+            "WHERE id = ?",
+            (SENT, time.time(), entry_id),
+        )
+        metrics.BROADCAST_QUEUE.dec()
+
+    def fail(self, entry: Entry, error: str, permanent: bool) -> bool:
+        """
+        Records a failed delivery: retried later with backoff, or dropped
+        when permanent or out of attempts. Returns True if it will be retried.
+        """
+        attempts = entry.attempts + 1
+        retry = not permanent and attempts < MAX_ATTEMPTS
+        now = time.time()
+        self._connect().execute(
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, "
+            "lease_until = NULL, error = ?, updated = ? WHERE id = ?",
+            (
+                PENDING if retry else FAILED,
+                attempts,
+                now + retry_delay(attempts),
+                error,
+                now,
+                entry.id,
+            ),
+        )
+        if not retry:
+            metrics.BROADCAST_QUEUE.dec()
+        return retry
+
+    def pending_count(self) -> int:
+        return _pending_count(self._connect())
+
+    def next_due(self) -> Optional[float]:
+        """Unix time when this worker can claim the next pending row, if any."""
+        index, count = self.partition
+        row = self._connect().execute(
+            "SELECT MIN(MAX("
+            "CASE WHEN abs(chat_id) % ? = ? THEN next_attempt "
+            "ELSE next_attempt + ? END, COALESCE(lease_until, 0))) FROM outbox "
+            "WHERE status = ?",
+            (count, index, ORPHAN_SECONDS, PENDING),
+        ).fetchone()
+        return row[0]
+
+
+def _pending_count(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)
+    ).fetchone()
+    return row[0]
+
+
+class OutboxSender:
+    """
+    Drains the outbox through the Broadcaster's rate limits with a pool of
+    workers. Runs in the background; wake() starts a pass right away.
+    `on_report` is awaited with the report of every pass that sent anything.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        broadcaster: Broadcaster,
+        workers: int = MAX_CONCURRENCY,
+        on_report: Optional[Callable[[BroadcastReport], Awaitable]] = None,
+        poll_seconds: float = IDLE_POLL_SECONDS,
+    ):
+        self.outbox = outbox
+        self.broadcaster = broadcaster
+        self.workers = workers
+        self.on_report = on_report
+        # Other replicas queue alerts without waking us: poll for them
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def drain(self) -> BroadcastReport:
+        """Sends every due row; returns the report of this pass."""
+        self.broadcaster.drop_idle_buckets()
+        report = BroadcastReport()
+        await asyncio.gather(*(self._worker(report) for _ in range(self.workers)))
+        report.finished = time.monotonic()
+        # Also counts what other replicas queued or sent meanwhile
+        pending = await asyncio.to_thread(self.outbox.pending_count)
+        metrics.BROADCAST_QUEUE.set(pending)
+        return report
+
+    async def _worker(self, report: BroadcastReport) -> None:
+        while True:
+            entries = await asyncio.to_thread(self.outbox.claim, CLAIM_SIZE)
+            if not entries:
+                return
+            for entry in entries:
+                await self._deliver(entry, report)
+
+    async def _deliver(self, entry: Entry, report: BroadcastReport) -> None:
+        if await self.broadcaster.send(entry.chat_id, entry.text, report):
+            await asyncio.to_thread(self.outbox.ack, entry.id)
+            return
+        error = report.failures.get(entry.chat_id)
+        retry = await asyncio.to_thread(
+            self.outbox.fail, entry, str(error), is_permanent(error)
+        )
+        if retry:
+            logger.warning(f"🔁 Alert to {entry.chat_id} will be retried later")
+
+    async def run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                report = await self.drain()
+                if report.sent or report.failures:
+                    logger.info(report.summary())
+                    if self.on_report is not None:
+                        await self.on_report(report)
+                due = await asyncio.to_thread(self.outbox.next_due)
+            except Exception as e:
+                logger.error(f"❌ Outbox pass failed: {e}")
+                due = None
+            timeout = self.poll_seconds
+            if due is not None:
+                timeout = min(timeout, max(0.0, due - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops sending; rows in flight are leased and resent after a restart."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
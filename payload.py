@@ -0,0 +1,276 @@
+import hashlib
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Dict, List, Optional, Sequence
+
+# The page ships its data as React flight chunks:
+#   <script>self.__next_f.push([1,"<JSON-escaped text>"])</script>
+# Concatenating the decoded strings gives the flight stream that holds
+# the "offers" and "rates" arrays.
+CHUNK_MARKER = 'self.__next_f.push([1,"'
+# How a chunk's string ends (an escaped quote inside it can match too)
+CHUNK_END = '"])'
+DEFAULT_KEYS = ("offers", "rates")
+
+# Bracket matching works on the decoded JSON text: whole strings and runs of
+# scalars are stepped over in C, only brackets reach the Python loop.
+_STRING = r'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+_SCALARS = r'[^\[\]{}"]++'
+_NEXT_BRACKET = re.compile(rf"(?:{_SCALARS}|{_STRING})*+([\[\]{{}}])")
+
+
+def _nested_value_pattern(depth: int) -> re.Pattern:
+    """Matches a whole array/object nested up to `depth` levels in one call."""
+    inner = f"(?:{_SCALARS}|{_STRING})*+"
+    for _ in range(depth):
+        inner = f"(?:{_SCALARS}|{_STRING}|[\\[{{]{inner}[\\]}}])*+"
+    return re.compile(f"[\\[{{]{inner}[\\]}}]")
+
+
+# Offers and rates are flat objects, so each element is skipped in one step
+_NESTED_VALUE = _nested_value_pattern(6)
+# Longest "key": <whitespace> [ prefix we expect to be split across two feeds
+_KEY_LOOKBEHIND = 64
+
+
+class _BlockFinder:
+    """
+    Finds the JSON arrays stored under the wanted keys in text fed piece
+    by piece. Only the unscanned end of a piece is carried into the next
+    one, so each character is matched once and nothing is recopied.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = tuple(keys)
+        self.blocks: Dict[str, str] = {}
+        self._key_pattern = re.compile(
+            r'"(%s)":\s*\[' % "|".join(re.escape(key) for key in self.keys)
+        )
+        # Text of the previous piece still to be scanned
+        self._carry = ""
+        # (key, depth, parts) of the array being matched
+        self._open: Optional[tuple] = None
+
+    @property
+    def complete(self) -> bool:
+        return len(self.blocks) == len(self.keys)
+
+    def scan(self, text: str) -> bool:
+        """Consumes the next piece of text and reports completion."""
+        text = self._carry + text
+        self._carry = ""
+        pos = 0
+        while not self.complete:
+            if self._open is None:
+                match = self._key_pattern.search(text, pos)
+                if match is None:
+                    self._carry = text[max(pos, len(text) - _KEY_LOOKBEHIND) :]
+                    return False
+                key = match.group(1)
+                pos = match.end()
+                if key in self.blocks:
+                    # Same key again, keep the first occurrence
+                    continue
+                pos -= 1
+                self._open = (key, 0, [])
+            pos = self._match(text, pos)
+            if pos is None:
+                return False
+        return True
+
+    def _match(self, text: str, start: int) -> Optional[int]:
+        """Position after the open array's end, or None if it goes on later."""
+        key, depth, parts = self._open
+        next_bracket = _NEXT_BRACKET.match
+        nested_value = _NESTED_VALUE.match
+        pos = start
+        while True:
+            token = next_bracket(text, pos)
+            if token is None:
+                # Piece ends mid-array (or mid-string), resume here later
+                parts.append(text[start:pos])
+                self._carry = text[pos:]
+                self._open = (key, depth, parts)
+                return None
+            pos = token.end()
+            char = token.group(1)
+            if char == "[" or char == "{":
+                if depth:
+                    value = nested_value(text, pos - 1)
+                    if value is not None:
+                        pos = value.end()
+                        continue
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    parts.append(text[start:pos])
+                    self.blocks[key] = "".join(parts)
+                    self._open = None
+                    return pos
+
+
+class FlightScanner:
+    """
+    Single-pass, incremental extractor for the Next.js flight payload.
+
+    Feed it the page as it arrives (all at once or in pieces); each push
+    chunk is decoded exactly once with the C string scanner and the stream
+    is bracket-matched as it grows. Once feed() returns True every wanted
+    block is complete and the rest of the page can be ignored.
+    """
+
+    def __init__(self, keys: Sequence[str] = DEFAULT_KEYS):
+        self.keys = tuple(keys)
+        self.chunks = 0
+        # Every piece fed, joined only if the raw page has to be searched
+        self._pieces: List[str] = []
+        # Pieces after the last decoded chunk, where the next marker is searched
+        self._tail: List[str] = []
+        # The tail starts with a chunk still downloading
+        self._waiting = False
+        # Last characters fed, for a chunk end split across pieces
+        self._tail_end = ""
+        self._flight = _BlockFinder(self.keys)
+        self._fallback: Optional[_BlockFinder] = None
+
+    @property
+    def blocks(self) -> Dict[str, str]:
+        """Raw JSON text of every block found so far, keyed by name."""
+        if self._fallback is None:
+            return self._flight.blocks
+        return {**self._fallback.blocks, **self._flight.blocks}
+
+    @property
+    def complete(self) -> bool:
+        return self._flight.complete
+
+    def feed(self, text: str) -> bool:
+        """Adds the next piece of the page; True once every block is complete."""
+        self._pieces.append(text)
+        self._tail.append(text)
+        edge = self._tail_end + text
+        self._tail_end = edge[-(len(CHUNK_END) - 1) :]
+        if self._waiting and CHUNK_END not in edge:
+            # The pending chunk can't have ended yet: don't decode it again
+            return self.complete
+        self._read_chunks(final=False)
+        return self.complete
+
+    def finish(self) -> None:
+        """
+        Marks the end of the page. Decodes any trailing chunk and, for keys
+        that never showed up in the flight stream, falls back to searching
+        the raw page: plain JSON (e.g. __NEXT_DATA__ or a saved fixture), then
+        JSON escaped inside a string outside the push chunks (\\"offers\\":[).
+        """
+        self._read_chunks(final=True)
+        if self.complete:
+            return
+        html = "".join(self._pieces)
+        self._pieces = [html]
+        missing = [key for key in self.keys if key not in self._flight.blocks]
+        self._fallback = _BlockFinder(missing)
+        self._fallback.scan(html)
+        for key in missing:
+            if key not in self._fallback.blocks:
+                block = _escaped_block(html, key)
+                if block is not None:
+                    self._fallback.blocks[key] = block
+
+    def decode(self, key: str) -> Optional[List[Any]]:
+        """JSON-decodes one block, resolving the items' Next.js "$D" date references."""
+        block = self.blocks.get(key)
+        if block is None:
+            return None
+        items = json.loads(block)
+        for item in items:
+            if isinstance(item, dict):
+                _resolve_dates(item)
+        return items
+
+    def fingerprint(self) -> str:
+        """Stable hash of the raw blocks, cheap to compare between scans."""
+        digest = hashlib.blake2b(digest_size=16)
+        blocks = self.blocks
+        for key in self.keys:
+            digest.update(blocks.get(key, "").encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _read_chunks(self, final: bool) -> None:
+        """Decodes every complete chunk in the tail into the flight stream."""
+        html = "".join(self._tail)
+        pos = 0
+        pieces = []
+        self._waiting = False
+        while True:
+            marker = html.find(CHUNK_MARKER, pos)
+            if marker < 0:
+                # Keep a possibly split marker at the end of the buffer
+                pos = max(pos, len(html) - len(CHUNK_MARKER) + 1)
+                break
+            body = marker + len(CHUNK_MARKER)
+            try:
+                text, end = scanstring(html, body)
+            except ValueError:
+                if not final:
+                    # Chunk still downloading, retried once it may have ended
+                    pos = marker
+                    self._waiting = True
+                    break
+                pos = body
+                continue
+            pieces.append(text)
+            pos = end
+        self._tail = [html[pos:]]
+        if pieces:
+            self.chunks += len(pieces)
+            self._flight.scan("".join(pieces))
+
+
+def _escaped_block(html: str, key: str) -> Optional[str]:
+    """
+    The array under \\"key\\": in JSON escaped inside a JavaScript string,
+    decoded from its opening bracket to the end of that string and then
+    bracket-matched. None when missing or not a valid string.
+    """
+    match = re.search(r'\\"%s\\":\s*\[' % re.escape(key), html)
+    if match is None:
+        return None
+    try:
+        # Decodes from the bracket up to the string's closing quote
+        text, _ = scanstring(html, match.end() - 1)
+    except ValueError:
+        return None
+    finder = _BlockFinder([key])
+    finder.scan(f'"{key}":{text}')
+    return finder.blocks.get(key)
+
+
+def _resolve_dates(item: Dict[str, Any]) -> None:
+    for key, value in item.items():
+        if value.__class__ is str and value.startswith("$D"):
+            item[key] = value[2:]
+
+
+def date_range(raw_offers: List[Dict]) -> str:
+    """First and last offer date ("YYYY-MM-DD - YYYY-MM-DD"), or "unknown"."""
+    dates = [item["date"][:10] for item in raw_offers if item.get("date")]
+    if not dates:
+        return "unknown"
+    return f"{min(dates)} - {max(dates)}"
+
+
+def extract_payload(html: str, keys: Sequence[str] = DEFAULT_KEYS) -> Dict[str, Any]:
+    """
+    One-shot extraction of a full page.
+    Returns the decoded blocks (None when missing) and the offers' date range.
+    """
+    scanner = FlightScanner(keys)
+    scanner.feed(html)
+    scanner.finish()
+    result: Dict[str, Any] = {key: scanner.decode(key) for key in scanner.keys}
+    result["date_range"] = date_range(result.get("offers") or [])
+    return result
@@ -0,0 +1,113 @@
+"""
+One scan cycle: fetch → diff → queue alerts → save → history.
+
+Shared by the bot's scheduler and the offline replay, which passes its
+own fetch function, state and outbox.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import metrics
+import scraper
+from diff import SnapshotDiff, alert_key
+from history import HistoryLog
+from models import Offer
+from outbox import Outbox
+from scheduler import CHANGED, ERROR, UNCHANGED
+from state import BotState
+
+logger = logging.getLogger("Pipeline")
+
+Fetch = Callable[..., Awaitable[Tuple[List[Offer], str]]]
+
+
+class ScanPipeline:
+    """
+    Runs scans against `state`, queueing alerts in `outbox`. `on_queued`
+    is called after alerts were queued (the bot wakes its sender there).
+    """
+
+    def __init__(
+        self,
+        state: BotState,
+        outbox: Outbox,
+        history: Optional[HistoryLog] = None,
+        fetch: Optional[Fetch] = None,
+        on_queued: Optional[Callable[[], None]] = None,
+    ):
+        self.state = state
+        self.outbox = outbox
+        self.history = history
+        self.fetch = fetch or scraper.get_new_offers_async
+        self.on_queued = on_queued
+        # Outcome of the last scan that got offers, for reports
+        self.last_changes: Optional[SnapshotDiff] = None
+        self.last_queued = 0
+
+    async def scan(self, timestamp: Optional[float] = None) -> str:
+        """One scan; returns CHANGED, UNCHANGED or ERROR for the scheduler."""
+        logger.info("Cron: Scanning for new offers...")
+        self.last_changes, self.last_queued = None, 0
+        all_items, date_range = await self.fetch(skip_unchanged=True)
+
+        if date_range == scraper.UNCHANGED:
+            logger.info("Cron: Offers unchanged, nothing to do.")
+            return UNCHANGED
+        if date_range in scraper.SCAN_ERRORS:
+            # Keep the cached offers instead of replacing them with nothing
+            logger.warning(
+                f"Cron: Scan failed ({date_range}), keeping cached offers."
+            )
+            return ERROR
+
+        # Filter only offers (is_offer == True)
+        offers = [item for item in all_items if item.is_offer]
+
+        # New offers and price changes against the cached snapshot
+        changes = self.last_changes = self.state.diff(offers)
+        metrics.OFFERS_SEEN.inc(len(offers))
+        metrics.NEW_OFFERS.inc(len(changes.added))
+        if changes:
+            logger.info(f"Cron: {changes.summary()}")
+
+        if changes.to_notify():
+            await self._queue_alerts(changes)
+        else:
+            logger.info("Cron: No new offers found.")
+
+        # Save all offers (for the /offers command and the next diff)
+        await self.state.save_offers(offers, date_range)
+        # Only now may later scans treat these pages as already handled
+        scraper.commit_scan()
+        if self.history is not None:
+            try:
+                await asyncio.to_thread(self.history.record, offers, timestamp)
+            except Exception as e:
+                logger.error(f"Failed to record offer history: {e}")
+        return CHANGED
+
+    async def _queue_alerts(self, changes: SnapshotDiff) -> None:
+        to_notify = [change.offer for change in changes.to_notify()]
+        logger.info(f"Found {len(to_notify)} offers to notify")
+        previous_prices = {
+            change.offer.id: change.previous.price
+            for change in changes.changed
+            if change.notify
+        }
+
+        # One message per distinct offer selection, shared by every user with it
+        alerts = []
+        for group_offers, user_ids in self.state.filter_index().fan_out(to_notify):
+            text = scraper.format_offer_message(group_offers, previous_prices)
+            # The price is part of the key: a cheaper slot is a new alert
+            group_keys = [alert_key(offer) for offer in group_offers]
+            alerts.extend((user_id, text, group_keys) for user_id in user_ids)
+
+        # Queued durably before saving the snapshot and marking as notified:
+        # a crash from here on resumes the deliveries instead of losing them
+        self.last_queued = await asyncio.to_thread(self.outbox.enqueue, alerts)
+        logger.info(f"📬 {self.last_queued} alerts queued")
+        await self.state.mark_notified(change.offer.id for change in changes.added)
+        if self.on_queued is not None:
+            self.on_queued()
@@ -0,0 +1,99 @@
+"""
+Standard price table built from the page's "rates" array.
+
+Rates are keyed by dayOfWeek (JavaScript: Sunday=0), hour and discipline,
+and their cents are the deposit, like offers (real price = cents * 2).
+"""
+from array import array
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from models import Offer
+
+HOURS = 24
+DAYS = 7
+# Marks a (day, hour, discipline) slot with no standard rate
+NO_RATE = -1
+
+
+def js_weekday(day: date) -> int:
+    """Python's Monday=0 weekday converted to JavaScript's Sunday=0."""
+    return (day.weekday() + 1) % 7
+
+
+class RateTable:
+    """
+    Flat (dayOfWeek × hour × discipline) table of real prices in cents.
+
+    Lookups are one index computation; pricing a whole calendar reuses
+    one precomputed row per weekday instead of searching the rates.
+    """
+
+    def __init__(self, rates: List[Dict]):
+        self.disciplines = sorted(
+            {str(rate.get("discipline", "")).lower() for rate in rates}
+        )
+        self._positions = {name: i for i, name in enumerate(self.disciplines)}
+        width = len(self.disciplines)
+        self._table = array("i", [NO_RATE]) * (DAYS * HOURS * width)
+        for rate in rates:
+            try:
+                day, hour = int(rate["dayOfWeek"]), int(rate["hour"])
+                cents = int(rate["cents"]) * 2
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= day < DAYS and 0 <= hour < HOURS:
+                position = self._positions[str(rate.get("discipline", "")).lower()]
+                self._table[(day * HOURS + hour) * width + position] = cents
+
+    def __len__(self) -> int:
+        return sum(1 for cents in self._table if cents != NO_RATE)
+
+    def base_cents(self, day: date, hour: int, discipline: str) -> Optional[int]:
+        """Standard real price for a slot, or None when there is no rate."""
+        position = self._positions.get(discipline.lower())
+        if position is None or not 0 <= hour < HOURS:
+            return None
+        width = len(self.disciplines)
+        cents = self._table[(js_weekday(day) * HOURS + hour) * width + position]
+        return None if cents == NO_RATE else cents
+
+    def calendar(self, start: date, weeks: int) -> Dict[Tuple[date, int, str], int]:
+        """Standard price of every rated slot in the next `weeks` weeks."""
+        width = len(self.disciplines)
+        # The week repeats: resolve each weekday's rated slots once
+        week_rows = []
+        for day in range(DAYS):
+            row = self._table[day * HOURS * width : (day + 1) * HOURS * width]
+            week_rows.append(
+                [
+                    (i // width, self.disciplines[i % width], cents)
+                    for i, cents in enumerate(row)
+                    if cents != NO_RATE
+                ]
+            )
+        result = {}
+        for offset in range(weeks * DAYS):
+            day = start + timedelta(days=offset)
+            for hour, discipline, cents in week_rows[js_weekday(day)]:
+                result[(day, hour, discipline)] = cents
+        return result
+
+    def annotate(self, offers: List[Offer]) -> int:
+        """
+        Sets base_cents and discount (percent below the standard rate,
+        0 if not cheaper) on each offer with a matching rate.
+        Returns how many offers are real discounts.
+        """
+        discounted = 0
+        for offer in offers:
+            if offer.ordinal is None or offer.hour is None:
+                continue
+            base = self.base_cents(offer.day, offer.hour, offer.discipline)
+            if not base:
+                continue
+            offer.base_cents = base
+            offer.discount = max(0, round(100 * (base - offer.cents) / base))
+            if offer.discount:
+                discounted += 1
+        return discounted
@@ -0,0 +1,311 @@
+"""
+Offline replay of recorded page captures.
+
+Captures are HTML files named after the time they were taken, e.g.
+captures/20261017T120000.html. They are scanned in name order through the
+same ScanPipeline as the bot (scan → diff → save → notify), with its own
+state in a scratch directory and a fake bot that records the alerts
+instead of sending them. Nothing waits on timers or rate limits, so it
+measures the pipeline itself and gives the same alerts on every run.
+
+    python replay.py captures/             parse the files directly
+    python replay.py captures/ --serve     fetch them from a local HTTP stub
+    python replay.py captures/ --record    add a capture of the live page
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import database
+import scraper
+from broadcaster import Broadcaster, percentile, telegram_errors
+from history import HistoryLog
+from outbox import Outbox, OutboxSender
+from pipeline import ScanPipeline
+from state import BotState
+
+logger = logging.getLogger("Replay")
+
+CAPTURE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+# Fake subscribers, chat IDs 1..N
+DEFAULT_USERS = 100
+# High enough that the broadcaster never waits
+UNLIMITED_RATE = 1e9
+
+
+class Capture(NamedTuple):
+    name: str
+    timestamp: float
+    html: str
+
+
+def capture_time(path: str) -> float:
+    """Time in the file name (YYYYMMDDTHHMMSS...), else its modification time."""
+    stem = os.path.basename(path)[: len("YYYYmmddTHHMMSS")]
+    try:
+        return datetime.strptime(stem, CAPTURE_TIME_FORMAT).timestamp()
+    except ValueError:
+        return os.path.getmtime(path)
+
+
+def load_captures(directory: str) -> List[Capture]:
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+    captures = []
+    for name in names:
+        path = os.path.join(directory, name)
+        with open(path, "r", encoding="utf-8") as f:
+            captures.append(Capture(name, capture_time(path), f.read()))
+    return captures
+
+
+def record_capture(directory: str, url: str = scraper.BASE_URL) -> str:
+    """Saves the live page as a new timestamped capture; returns its path."""
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    response = requests.get(url, headers=scraper.HEADERS, timeout=15)
+    response.raise_for_status()
+    name = datetime.now().strftime(CAPTURE_TIME_FORMAT) + ".html"
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    return path
+
+
+class FakeBot:
+    """
+    Stands in for telegram.Bot: records messages, fails for `dead_chats`
+    (with Telegram's own error, so only then is the library loaded).
+    """
+
+    def __init__(self, dead_chats: Set[int] = frozenset()):
+        self.dead_chats = set(dead_chats)
+        self.messages: List[Tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        if chat_id in self.dead_chats:
+            raise telegram_errors().Forbidden("Forbidden: bot was blocked by the user")
+        self.messages.append((chat_id, text))
+
+
+class CaptureStub:
+    """Local HTTP server answering every GET with the current capture."""
+
+    def __init__(self):
+        self.body = b""
+        self.etag = ""
+        self.requests = 0
+        self.not_modified = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def show(self, html: str) -> None:
+        self.body = html.encode("utf-8")
+        digest = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self.etag = f'"{digest}"'
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            self.requests += 1
+            if headers.get("if-none-match") == self.etag:
+                self.not_modified += 1
+                status, body = "304 Not Modified", b""
+            else:
+                status, body = "200 OK", self.body
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/html; charset=utf-8\r\n"
+                f"ETag: {self.etag}\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class SnapshotResult(NamedTuple):
+    name: str
+    status: str
+    summary: str
+    queued: int
+    delivered: int
+    seconds: float
+
+
+class ReplayReport:
+    def __init__(self, results: List[SnapshotResult], bot: FakeBot, elapsed: float):
+        self.results = results
+        self.elapsed = elapsed
+        self.alerts = len(bot.messages)
+        # The same message to the same chat twice is a duplicate alert
+        self.duplicates = sum(n - 1 for n in Counter(bot.messages).values() if n > 1)
+
+    @property
+    def scans_per_second(self) -> float:
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, pct: float) -> float:
+        return percentile([result.seconds for result in self.results], pct)
+
+    def print(self) -> None:
+        print(f"{'snapshot':<28} {'status':<10} {'queued':>7} {'sent':>6} {'ms':>8}")
+        for r in self.results:
+            print(
+                f"{r.name:<28} {r.status:<10} {r.queued:>7} {r.delivered:>6} "
+                f"{r.seconds * 1000:>8.2f}  {r.summary}"
+            )
+        print(
+            f"\n🔁 {len(self.results)} snapshots in {self.elapsed:.2f}s "
+            f"({self.scans_per_second:.1f} scans/s), {self.alerts} alerts, "
+            f"{self.duplicates} duplicates"
+        )
+        print(
+            f"   Scan to last delivery: p50 {self.percentile(50) * 1000:.2f} ms, "
+            f"p99 {self.percentile(99) * 1000:.2f} ms"
+        )
+
+
+async def replay(
+    captures: List[Capture],
+    users: int = DEFAULT_USERS,
+    serve: bool = False,
+    dead_chats: Set[int] = frozenset(),
+) -> ReplayReport:
+    """
+    Scans every capture in order and delivers its alerts to a FakeBot.
+    Runs in the current directory: call it from a scratch one.
+    """
+    bot = FakeBot(dead_chats)
+    broadcaster = Broadcaster(
+        bot, global_rate=UNLIMITED_RATE, per_chat_rate=UNLIMITED_RATE
+    )
+    outbox = Outbox()
+    state = BotState()
+    await state.load()
+    for chat_id in range(1, users + 1):
+        await state.add_user(chat_id)
+
+    sender = OutboxSender(outbox, broadcaster)
+    current: Dict[str, Capture] = {}
+
+    stub = None
+    if serve:
+        stub = CaptureStub()
+        await stub.start()
+
+        async def fetch(skip_unchanged: bool = False):
+            return await scraper.get_new_offers_async(skip_unchanged, urls=[stub.url])
+
+    else:
+
+        async def fetch(skip_unchanged: bool = False):
+            html = current["capture"].html
+            return scraper._parse_offers(html, skip_unchanged, "replay")
+
+    pipeline = ScanPipeline(state, outbox, HistoryLog(), fetch=fetch)
+    results = []
+    started = time.perf_counter()
+    try:
+        for capture in captures:
+            current["capture"] = capture
+            if stub is not None:
+                stub.show(capture.html)
+            scan_started = time.perf_counter()
+            status = await pipeline.scan(timestamp=capture.timestamp)
+            report = await sender.drain()
+            # As the bot does after each pass
+            await state.remove_users(report.dead_chats())
+            changes = pipeline.last_changes
+            results.append(
+                SnapshotResult(
+                    capture.name,
+                    status,
+                    changes.summary() if changes is not None else "",
+                    pipeline.last_queued,
+                    report.sent,
+                    time.perf_counter() - scan_started,
+                )
+            )
+    finally:
+        elapsed = time.perf_counter() - started
+        if stub is not None:
+            await stub.close()
+            await scraper.close_async_client()
+        await state.close()
+    return ReplayReport(results, bot, elapsed)
+
+
+def run(args: argparse.Namespace) -> ReplayReport:
+    """Replays `args.captures` in a scratch directory (or `args.workdir`)."""
+    captures = load_captures(args.captures)
+    if not captures:
+        raise SystemExit(f"No .html captures in {args.captures}")
+    workdir = args.workdir or tempfile.mkdtemp(prefix="replay-")
+    os.makedirs(workdir, exist_ok=True)
+    home = os.getcwd()
+    # State, outbox and history use relative paths under data/
+    os.chdir(workdir)
+    try:
+        report = asyncio.run(
+            replay(captures, args.users, args.serve, set(args.dead or []))
+        )
+        database.flush()
+    finally:
+        os.chdir(home)
+    logger.info(f"Replay state left in {workdir}")
+    return report
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("captures", help="directory of timestamped .html captures")
+    parser.add_argument("--serve", action="store_true", help="fetch over local HTTP")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument(
+        "--dead", type=int, nargs="*", help="chat IDs that have blocked the bot"
+    )
+    parser.add_argument("--workdir", help="where to keep the replay state")
+    parser.add_argument(
+        "--record", action="store_true", help="save the live page as a capture first"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.record:
+        print(f"💾 Saved {record_capture(args.captures)}")
+    run(args).print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description="Replay recorded page captures")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,199 @@
+"""
+Adaptive polling loop for the offers scan.
+
+Runs one scan at a time and picks the next delay from the last outcome:
+the base interval after a change, a growing interval while the page stays
+the same, exponential backoff after errors, and a short interval during
+the hours when offers have historically dropped.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Counter, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger("Scheduler")
+
+# Outcomes a scan job reports back to the scheduler
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+ERROR = "error"
+
+BASE_INTERVAL = 60
+# Interval while inside a historical drop window
+HOT_INTERVAL = 20
+MAX_INTERVAL = 10 * 60
+# Each unchanged scan in a row stretches the interval by this factor
+UNCHANGED_BACKOFF = 1.5
+# Each error in a row doubles the interval
+ERROR_BACKOFF = 2
+# Random spread applied to every delay (±10%)
+JITTER = 0.1
+# An hour counts as a drop window once this many offers appeared in it
+HOT_WINDOW_MIN_DROPS = 2
+# How often the drop windows are recomputed from the history
+HOT_WINDOW_REFRESH = 6 * 60 * 60
+
+Window = Tuple[int, int]  # (weekday Monday=0, hour), local time
+
+
+class Decision(NamedTuple):
+    """Why and when the scheduler will run the next scan."""
+
+    status: str
+    delay: float
+    next_run: datetime
+    reason: str
+
+    def describe(self) -> str:
+        return (
+            f"⏱️ Next scan at {self.next_run:%H:%M:%S} "
+            f"(in {self.delay:.0f}s, {self.reason})"
+        )
+
+
+def hot_windows(
+    drop_times: Counter, min_drops: int = HOT_WINDOW_MIN_DROPS
+) -> Set[Window]:
+    """(weekday, hour) slots where offers have appeared often enough."""
+    return {window for window, count in drop_times.items() if count >= min_drops}
+
+
+class AdaptiveScheduler:
+    """
+    Calls `job` in a loop, never twice at the same time. The job returns
+    CHANGED, UNCHANGED or ERROR; exceptions count as ERROR.
+    `windows_source` (blocking, run in a thread) returns the hot windows.
+    """
+
+    def __init__(
+        self,
+        job: Callable[[], Awaitable[str]],
+        base_interval: float = BASE_INTERVAL,
+        hot_interval: float = HOT_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        jitter: float = JITTER,
+        windows_source: Optional[Callable[[], Set[Window]]] = None,
+    ):
+        self.job = job
+        self.base_interval = base_interval
+        self.hot_interval = hot_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.windows_source = windows_source
+        self.windows: Set[Window] = set()
+        self.unchanged_streak = 0
+        self.error_streak = 0
+        self.last_decision: Optional[Decision] = None
+        self._windows_loaded = 0.0
+        self._running = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # Decisions
+
+    def decide(self, status: str, now: Optional[datetime] = None) -> Decision:
+        """Updates the streaks with a scan outcome and picks the next delay."""
+        now = now or datetime.now()
+        if status == ERROR:
+            self.error_streak += 1
+            delay = self.base_interval * ERROR_BACKOFF**self.error_streak
+            reason = f"error #{self.error_streak}, backing off"
+        else:
+            self.error_streak = 0
+            if status == UNCHANGED:
+                self.unchanged_streak += 1
+                delay = self.base_interval * UNCHANGED_BACKOFF**self.unchanged_streak
+                reason = f"unchanged x{self.unchanged_streak}"
+            else:
+                self.unchanged_streak = 0
+                delay = self.base_interval
+                reason = "page changed"
+        delay = min(delay, self.max_interval)
+
+        # Errors keep backing off even in a hot window: the server is struggling
+        if status != ERROR and self.windows:
+            if self._in_window(now):
+                if delay > self.hot_interval:
+                    delay, reason = self.hot_interval, "drop window"
+            else:
+                until = self._until_next_window(now, delay)
+                if until is not None:
+                    delay, reason = max(until, self.hot_interval), "drop window ahead"
+
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        delay = max(delay, 1.0)
+        self.last_decision = Decision(
+            status, delay, now + timedelta(seconds=delay), reason
+        )
+        return self.last_decision
+
+    def _in_window(self, moment: datetime) -> bool:
+        return (moment.weekday(), moment.hour) in self.windows
+
+    def _until_next_window(self, now: datetime, delay: float) -> Optional[float]:
+        """Seconds until a hot window that starts before `delay` runs out."""
+        start = now.replace(minute=0, second=0, microsecond=0)
+        horizon = now + timedelta(seconds=delay)
+        while True:
+            start += timedelta(hours=1)
+            if start >= horizon:
+                return None
+            if self._in_window(start):
+                return (start - now).total_seconds()
+
+    # Running
+
+    @property
+    def busy(self) -> bool:
+        return self._running.locked()
+
+    async def run_once(self) -> Optional[str]:
+        """Runs the job unless a scan is already in flight (then returns None)."""
+        if self._running.locked():
+            logger.warning("Scan still running, skipping overlapping run")
+            return None
+        async with self._running:
+            try:
+                return await self.job()
+            except Exception as e:
+                logger.error(f"❌ Scan failed: {e}")
+                return ERROR
+
+    async def _refresh_windows(self) -> None:
+        if self.windows_source is None:
+            return
+        loaded = self._windows_loaded
+        if loaded and time.monotonic() - loaded < HOT_WINDOW_REFRESH:
+            return
+        try:
+            self.windows = await asyncio.to_thread(self.windows_source)
+            logger.info(f"🔥 {len(self.windows)} drop windows loaded from history")
+        except Exception as e:
+            logger.error(f"Failed to load drop windows: {e}")
+        self._windows_loaded = time.monotonic()
+
+    async def run(self) -> None:
+        while True:
+            await self._refresh_windows()
+            status = await self.run_once()
+            decision = self.decide(status or ERROR)
+            logger.info(decision.describe())
+            await asyncio.sleep(decision.delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancels the loop, letting an in-flight scan finish first."""
+        if self._task is None:
+            return
+        async with self._running:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,9 +1,16 @@
-import requests
+import asyncio
+import httpx
 import json
-import re
 import logging
+import os
+import time
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+import metrics
+import payload
+from models import Offer
+from rates import RateTable
 
 # Configure Logger
 logger = logging.getLogger("Scraper")
@@ -13,85 +20,152 @@ BASE_URL = "https://www.polferrer.com"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
-# Regex to capture the "offers" array inside the Next.js script
-OFFERS_PATTERN = re.compile(r'\\?"offers\\?":\s*(\[\{.*?\}\])')
 
+# Pages scanned each time, comma separated (e.g. discipline or calendar pages)
+SCAN_URLS = [
+    url.strip() for url in os.getenv("SCAN_URLS", BASE_URL).split(",") if url.strip()
+]
+# Pages downloaded at the same time; also the size of the connection pool
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "4"))
+
+# Status returned instead of a date range when the page has not changed
+UNCHANGED = "unchanged"
+# Statuses returned instead of a date range when a scan failed
+SCAN_ERRORS = {"Network Error", "Unexpected Error", "JSON Error", "No data found"}
+# Size of the decoded text pieces fed to the extractor while streaming
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Shared keep-alive client for the async scan path (created on first use)
+_async_client: Optional[httpx.AsyncClient] = None
+# Per URL: ETag / Last-Modified of the last full response, for a conditional GET
+_validators: Dict[str, Dict[str, str]] = {}
+# Per URL: result of the last successful parse, reused while the page is unchanged
+_last_results: Dict[str, Tuple[List[Offer], str]] = {}
+# Per URL: hash of the raw offers/rates blocks seen in the last successful parse
+_fingerprints: Dict[str, str] = {}
+# Per URL: validators, fingerprint and result of the current scan, moved to the
+# caches above by commit_scan() once the caller has acted on the offers
+_pending: Dict[str, Dict] = {}
 
-def _process_offer(raw_item: Dict) -> Dict[str, str]:
+
+def _process_offer(raw_item: Dict) -> Offer:
     """
     Internal helper: Parses a single raw offer item, calculates the real price,
-    and formats the date and time correctly.
+    and reads the date and time once into an Offer.
     """
     # 1. Price Calculation (Deposit x 2)
     deposit_cents = raw_item.get("cents", 0)
-    total_price_euro = (deposit_cents * 2) / 100
+    total_cents = int(deposit_cents * 2)
 
     # 2. Date & Time Parsing
     raw_date = raw_item.get("date", "")
-    raw_hour = raw_item.get("hour")
+    raw_hour = _optional_hour(raw_item.get("hour"))
 
     try:
-        # Parse date
         dt = datetime.fromisoformat(raw_date.replace("Z", "+00:00"))
-        formatted_date = dt.strftime("%Y-%m-%d")
+        ordinal, date_text = dt.toordinal(), None
 
         # Parse time: Use 'hour' field if available, otherwise use ISO time
         if raw_hour is not None:
-            formatted_time = f"{int(raw_hour):02d}:00"
+            hour, minute = raw_hour, 0
         else:
-            formatted_time = dt.strftime("%H:%M")
+            hour, minute = dt.hour, dt.minute
 
     except ValueError:
-        formatted_date = raw_date
-        formatted_time = f"{raw_hour}:00" if raw_hour is not None else "??"
-
-    return {
-        "is_offer": True,
-        "discipline": raw_item.get("discipline", "General").capitalize(),
-        "date": formatted_date,
-        "time": formatted_time,
-        "price": f"{total_price_euro:.0f}€",
-        "original_date": raw_date,
-    }
+        ordinal, date_text = None, raw_date
+        hour, minute = raw_hour, 0
+
+    return Offer(
+        raw_item.get("discipline", "General").capitalize(),
+        ordinal,
+        hour,
+        total_cents,
+        minute=minute,
+        original_date=raw_date,
+        date_text=date_text,
+    )
+
+
+def _optional_hour(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
 
 
-def get_new_offers() -> Tuple[List[Dict], str]:
+def _parse_offers(
+    html: str, skip_unchanged: bool = False, url: str = BASE_URL
+) -> Tuple[List[Offer], str]:
     """
-    Main function called by main.py.
-    Fetches the website, extracts the hidden JSON data using Regex,
-    and parses available offers.
+    Internal helper: Extracts the "offers" and "rates" blocks from the Next.js
+    flight payload in one pass and parses the available offers.
     """
-    try:
-        logger.info("📡 Downloading data from PolFerrer...")
-        response = requests.get(BASE_URL, headers=HEADERS, timeout=15)
-        response.raise_for_status()
+    scanner = payload.FlightScanner()
+    scanner.feed(html)
+    scanner.finish()
+    return _parse_scanner(scanner, skip_unchanged, url)
 
-        # Extract the specific JSON block using Regex
-        match = OFFERS_PATTERN.search(response.text)
 
-        if not match:
-            logger.warning("⚠️ 'offers' block not found in HTML.")
-            return [], "No data found"
+def _parse_scanner(
+    scanner: payload.FlightScanner, skip_unchanged: bool = False, url: str = BASE_URL
+) -> Tuple[List[Offer], str]:
+    """
+    Internal helper: Parses the offers from an already fed extractor.
+    With skip_unchanged, returns ([], UNCHANGED) without decoding anything
+    when the blocks hash the same as in the last parse of `url`.
+    """
+    if "offers" not in scanner.blocks:
+        logger.warning(f"⚠️ 'offers' block not found in {url}.")
+        _fingerprints.pop(url, None)
+        return [], "No data found"
 
-        # Clean Next.js artifacts (escaped quotes and $D prefixes)
-        clean_json = match.group(1).replace('\\"', '"').replace("$D", "")
+    fingerprint = scanner.fingerprint()
+    if skip_unchanged and fingerprint == _fingerprints.get(url):
+        logger.info(f"♻️ Offers unchanged since last scan of {url}.")
+        return [], UNCHANGED
 
-        try:
-            raw_offers_data = json.loads(clean_json)
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Error parsing JSON: {e}")
-            return [], "JSON Error"
+    try:
+        raw_offers_data = scanner.decode("offers")
+    except json.JSONDecodeError as e:
+        logger.error(f"❌ Error parsing JSON: {e}")
+        _fingerprints.pop(url, None)
+        return [], "JSON Error"
 
-        # Process offers using list comprehension
-        found_items = [_process_offer(item) for item in raw_offers_data]
+    # Process offers using list comprehension
+    found_items = [_process_offer(item) for item in raw_offers_data]
+    date_range = payload.date_range(raw_offers_data)
 
-        # TODO: Extract date range from the page if needed. For now, we return "unknown".
-        date_range = "unknown"
+    # Compare each offer with the standard rate for its slot
+    try:
+        raw_rates = scanner.decode("rates")
+    except json.JSONDecodeError as e:
+        logger.warning(f"⚠️ Could not parse 'rates': {e}")
+        raw_rates = None
+    if raw_rates:
+        discounted = RateTable(raw_rates).annotate(found_items)
+        logger.info(f"💸 {discounted} offers below the standard rate")
 
-        logger.info(
-            f"✅ Analysis complete. {f'{len(found_items)} ofertas encontradas' if found_items else 'Sin ofertas'}"
-        )
-        return found_items, date_range
+    _pending.setdefault(url, {})["fingerprint"] = fingerprint
+    logger.info(
+        f"✅ Analysis complete. {f'{len(found_items)} ofertas encontradas' if found_items else 'Sin ofertas'}"
+    )
+    return found_items, date_range
+
+
+def get_new_offers() -> Tuple[List[Offer], str]:
+    """
+    Blocking scrape, kept for scripts and one-off checks.
+    Fetches the website, extracts the hidden JSON data from the Next.js
+    payload, and parses available offers.
+    """
+    # Imported here: the bot and the CLI only use the async path
+    import requests
+
+    try:
+        logger.info("📡 Downloading data from PolFerrer...")
+        response = requests.get(BASE_URL, headers=HEADERS, timeout=15)
+        response.raise_for_status()
+        return _parse_offers(response.text)
 
     except requests.RequestException as e:
         logger.error(f"❌ Network error during scraping: {e}")
@@ -101,9 +175,210 @@ def get_new_offers() -> Tuple[List[Dict], str]:
         return [], "Unexpected Error"
 
 
-def format_offer_message(offers: List[Dict]) -> str:
+def _get_async_client() -> httpx.AsyncClient:
+    """Returns the shared async client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=15,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENT_FETCHES,
+                max_keepalive_connections=MAX_CONCURRENT_FETCHES,
+            ),
+        )
+    return _async_client
+
+
+def _conditional_headers(url: str) -> Dict[str, str]:
+    """Builds If-None-Match / If-Modified-Since from the last full response."""
+    validators = _validators.get(url, {})
+    headers = {}
+    if "etag" in validators:
+        headers["If-None-Match"] = validators["etag"]
+    if "last-modified" in validators:
+        headers["If-Modified-Since"] = validators["last-modified"]
+    return headers
+
+
+def _remember_validators(url: str, response: httpx.Response) -> None:
+    _pending.setdefault(url, {})["validators"] = {
+        name: response.headers[name]
+        for name in ("etag", "last-modified")
+        if response.headers.get(name)
+    }
+
+
+async def _stream_page(response: httpx.Response) -> payload.FlightScanner:
+    """
+    Feeds the body to the extractor as it arrives and stops reading as soon
+    as the offers and rates blocks are complete. Pages where a block never
+    completes are read to the end and searched in full.
+    """
+    scanner = payload.FlightScanner()
+    # Only the scanner's share of the time; the rest is waiting on the network
+    extract_seconds = 0.0
+    async for text in response.aiter_text(STREAM_CHUNK_SIZE):
+        started = time.perf_counter()
+        complete = scanner.feed(text)
+        extract_seconds += time.perf_counter() - started
+        if complete:
+            logger.info(
+                f"⏩ Offers found after {response.num_bytes_downloaded // 1024} KB, "
+                "closing the download early."
+            )
+            metrics.EXTRACT_SECONDS.observe(extract_seconds)
+            return scanner
+    started = time.perf_counter()
+    scanner.finish()
+    metrics.EXTRACT_SECONDS.observe(extract_seconds + time.perf_counter() - started)
+    return scanner
+
+
+async def _fetch_page(url: str, limit: asyncio.Semaphore) -> Tuple[List[Offer], str]:
+    """
+    Downloads and parses one page. Returns ([], UNCHANGED) when it answers
+    304 or its blocks hash the same as last time.
+    """
+    async with limit:
+        try:
+            logger.info(f"📡 Downloading data from {url}...")
+            started = time.perf_counter()
+            result = "error"
+            try:
+                async with _get_async_client().stream(
+                    "GET", url, headers=_conditional_headers(url)
+                ) as response:
+                    if response.status_code == 304:
+                        result = "not_modified"
+                        logger.info(f"♻️ {url} not modified since last scan.")
+                        return [], UNCHANGED
+
+                    response.raise_for_status()
+                    scanner = await _stream_page(response)
+                    _remember_validators(url, response)
+                    metrics.FETCH_BYTES.observe(response.num_bytes_downloaded)
+                result = "ok"
+            finally:
+                # Timeouts and errors too: they are usually the slowest fetches
+                metrics.FETCH_SECONDS.labels(result).observe(
+                    time.perf_counter() - started
+                )
+
+            with metrics.PARSE_SECONDS.time():
+                return _parse_scanner(scanner, skip_unchanged=True, url=url)
+
+        except httpx.HTTPError as e:
+            logger.error(f"❌ Network error during scraping of {url}: {e}")
+            return [], "Network Error"
+        except Exception as e:
+            logger.error(f"❌ Unexpected error scraping {url}: {e}")
+            return [], "Unexpected Error"
+
+
+async def get_new_offers_async(
+    skip_unchanged: bool = False, urls: Optional[List[str]] = None
+) -> Tuple[List[Offer], str]:
+    """
+    Main function called by the bot's scan pipeline.
+    Same result as get_new_offers(), but never blocks the bot's event loop.
+    Every page in `urls` (default SCAN_URLS) is fetched at the same time, at
+    most MAX_CONCURRENT_FETCHES at once, over one pooled keep-alive client,
+    and the offers are merged by ID (the first page listing an offer wins).
+    Each page is requested with a conditional GET and streamed, stopping
+    once its data is complete. Unchanged and failed pages contribute their
+    last parsed offers; the scan fails (returns the error status) when a
+    failed page was never parsed before or when no page changed.
+    With skip_unchanged, ([], UNCHANGED) is returned when no page changed
+    so the caller can skip its diff and disk writes.
+    What the scan learned about each page is only kept for the next scans
+    once the caller calls commit_scan().
+    """
+    urls = urls or SCAN_URLS
+    _pending.clear()
+    limit = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    results = await asyncio.gather(*(_fetch_page(url, limit) for url in urls))
+
+    changed = False
+    error = None
+    pages = []
+    for url, (items, status) in zip(urls, results):
+        if status in SCAN_ERRORS:
+            if url not in _last_results:
+                return [], status
+            logger.warning(f"⚠️ Using the last offers of {url} ({status}).")
+            error = error or status
+            items, status = _last_results[url]
+        elif status == UNCHANGED:
+            items, status = _last_results.get(url, ([], "unknown"))
+        else:
+            changed = True
+            _pending.setdefault(url, {})["result"] = (items, status)
+        pages.append((items, status))
+
+    if not changed and error:
+        return [], error
+    if skip_unchanged and not changed:
+        return [], UNCHANGED
+    if len(pages) == 1:
+        return pages[0]
+
+    merged: Dict[str, Offer] = {}
+    for items, _ in pages:
+        for offer in items:
+            merged.setdefault(offer.id, offer)
+    logger.info(f"🔗 {len(merged)} offers merged from {len(urls)} pages")
+    return list(merged.values()), _merge_date_ranges(status for _, status in pages)
+
+
+def _merge_date_ranges(ranges) -> str:
+    """Widest span of several "YYYY-MM-DD - YYYY-MM-DD" ranges."""
+    bounds = [r.split(" - ") for r in ranges if r != "unknown" and " - " in r]
+    if not bounds:
+        return "unknown"
+    return f"{min(b[0] for b in bounds)} - {max(b[1] for b in bounds)}"
+
+
+def commit_scan() -> None:
+    """
+    Keeps the validators, fingerprints and results of the last scan, so the
+    next scans skip the pages while they stay the same. Called once its
+    offers were saved: if anything fails before, the next scan fetches and
+    parses the pages again instead of finding them unchanged.
+    """
+    for url, seen in _pending.items():
+        if "validators" in seen:
+            _validators[url] = seen["validators"]
+        if "fingerprint" in seen:
+            _fingerprints[url] = seen["fingerprint"]
+        if "result" in seen:
+            _last_results[url] = seen["result"]
+    _pending.clear()
+
+
+def reset_scan_cache() -> None:
+    """Forgets validators, fingerprints and last results, so every page is reparsed."""
+    _validators.clear()
+    _fingerprints.clear()
+    _last_results.clear()
+    _pending.clear()
+
+
+async def close_async_client() -> None:
+    """Closes the shared async client (called on bot shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def format_offer_message(
+    offers: List[Offer], previous_prices: Optional[Dict[str, str]] = None
+) -> str:
     """
     Formats the list of offers into an HTML message for Telegram.
+    `previous_prices` maps the ID of offers that got cheaper to their old price.
     """
     if not offers:
         return f"🔎 No hay ofertas disponibles en este momento. Visita {BASE_URL} para ver todas las actividades."
@@ -111,9 +386,13 @@ def format_offer_message(offers: List[Dict]) -> str:
     lines = ["🚨 <b>¡NUEVAS OFERTAS!</b> 🚨", ""]
 
     for offer in offers:
+        discount = offer.discount
+        saving = f" <s>{offer.base_price}</s> (-{discount}%)" if discount else ""
+        if previous_prices and offer.id in previous_prices:
+            saving += f" 📉 antes {previous_prices[offer.id]}"
         lines.append(
-            f"📅 <b>{offer['date']}</b> a las <b>{offer['time']}</b>\n"
-            f"🏍️ {offer['discipline']} - 💰 <b>{offer['price']}</b>\n"
+            f"📅 <b>{offer.date}</b> a las <b>{offer.time}</b>\n"
+            f"🏍️ {offer.discipline} - 💰 <b>{offer.price}</b>{saving}\n"
         )
 
     lines.append(f'🔗 <a href="{BASE_URL}">Reservar ahora</a>')
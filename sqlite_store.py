@@ -0,0 +1,266 @@
+"""
+SQLite (WAL) implementation of the database.py functions.
+
+Selected with DB_BACKEND=sqlite. On first use it imports the existing
+JSON files (users, cached offers and notified IDs) once.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from models import Offer, SortedOffers, as_offer
+
+logger = logging.getLogger("Database")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS user_filters (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id TEXT PRIMARY KEY,
+    discipline TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_date_discipline ON offers (date, discipline);
+CREATE TABLE IF NOT EXISTS notified_offers (
+    offer_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Offers whose date is not YYYY-MM-DD are kept, like the JSON backend does
+_ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+
+# One connection per thread and file; WAL lets readers and the writer run
+# side by side
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def connect(path: str, schema: str = "") -> sqlite3.Connection:
+    """
+    This thread's connection to the SQLite file at `path`, opened on first
+    use: creates its directory, enables WAL and runs `schema` (made of
+    CREATE ... IF NOT EXISTS statements). Also used by the outbox and the
+    leader lease.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if schema:
+            conn.executescript(schema)
+        connections[path] = conn
+    return conn
+
+
+def _connect() -> sqlite3.Connection:
+    # Paths live in database.py, which imports this module
+    import database
+
+    conn = connect(database.DB_SQLITE)
+    _initialize(conn)
+    return conn
+
+
+def _initialize(conn: sqlite3.Connection) -> None:
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn.executescript(_SCHEMA)
+        migrated = conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'")
+        if migrated.fetchone() is None:
+            _migrate_from_json(conn)
+        _initialized = True
+
+
+def _migrate_from_json(conn: sqlite3.Connection) -> None:
+    """One-shot import of data/database.json and data/offers_cache.json."""
+    import database
+
+    users, filters, offers, date_range, notified = [], {}, [], "unknown", []
+    if os.path.exists(database.DB_FILE_USERS):
+        try:
+            with open(database.DB_FILE_USERS, "r") as f:
+                user_data = json.load(f)
+            users = user_data.get("users", [])
+            filters = user_data.get("filters", {})
+        except Exception as e:
+            logger.warning(f"Failed to read {database.DB_FILE_USERS}: {e}")
+    if os.path.exists(database.DB_OFFERS_CACHE):
+        try:
+            with open(database.DB_OFFERS_CACHE, "r") as f:
+                cache = json.load(f)
+            offers = cache.get("offers", [])
+            date_range = cache.get("date_range", "unknown")
+            notified = cache.get("notified_offers", [])
+        except Exception as e:
+            logger.warning(f"Failed to read {database.DB_OFFERS_CACHE}: {e}")
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id) VALUES (?)", ((u,) for u in users)
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO user_filters (user_id, data) VALUES (?, ?)",
+            ((int(uid), json.dumps(f)) for uid, f in filters.items()),
+        )
+        _replace_offers(conn, map(as_offer, offers), date_range)
+        conn.executemany(
+            "INSERT OR IGNORE INTO notified_offers (offer_id) VALUES (?)",
+            ((nid,) for nid in notified),
+        )
+        conn.execute("INSERT INTO meta (key, value) VALUES ('migrated', '1')")
+    logger.info(
+        f"Migrated {len(users)} users and {len(offers)} offers "
+        f"from JSON to {database.DB_SQLITE}"
+    )
+
+
+def _replace_offers(
+    conn: sqlite3.Connection, offers: Iterable[Offer], date_range: str
+) -> None:
+    conn.execute("DELETE FROM offers")
+    conn.executemany(
+        "INSERT OR REPLACE INTO offers (offer_id, discipline, date, time, data) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (
+            (o.id, o.discipline, o.date, o.time, json.dumps(o.to_dict()))
+            for o in offers
+        ),
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('date_range', ?)",
+        (date_range,),
+    )
+
+
+def add_user(user_id):
+    cursor = _connect().execute(
+        "INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,)
+    )
+    return cursor.rowcount == 1
+
+
+def remove_user(user_id):
+    remove_users([user_id])
+
+
+def remove_users(user_ids):
+    rows = [(user_id,) for user_id in user_ids]
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("DELETE FROM users WHERE user_id = ?", rows)
+        conn.executemany("DELETE FROM user_filters WHERE user_id = ?", rows)
+
+
+def get_filters():
+    rows = _connect().execute("SELECT user_id, data FROM user_filters")
+    return {user_id: json.loads(data) for user_id, data in rows}
+
+
+def set_filter(user_id, offer_filter):
+    conn = _connect()
+    if offer_filter is None:
+        conn.execute("DELETE FROM user_filters WHERE user_id = ?", (user_id,))
+    else:
+        conn.execute(
+            "INSERT OR REPLACE INTO user_filters (user_id, data) VALUES (?, ?)",
+            (user_id, json.dumps(offer_filter)),
+        )
+
+
+def get_users():
+    rows = _connect().execute("SELECT user_id FROM users ORDER BY rowid")
+    return [row[0] for row in rows]
+
+
+def save_offers(offers, date_range):
+    # Same rule as the JSON backend: keep today/future and unparseable dates
+    current_offers = SortedOffers(offers)
+    current_offers.prune(date.today())
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _replace_offers(conn, current_offers, date_range)
+        # Keep only notified IDs that are still in current offers
+        conn.execute(
+            "DELETE FROM notified_offers "
+            "WHERE offer_id NOT IN (SELECT offer_id FROM offers)"
+        )
+
+
+def load_cached_offers() -> Tuple[List[Offer], str, List[str]]:
+    """Load cached offers, filtering to keep only current and future ones."""
+    return _cached_offers(_connect())
+
+
+def read_snapshot() -> Tuple[List[Offer], str, List[str], int]:
+    """
+    Cached offers, date range, notified IDs and subscriber count through a
+    read-only connection: unlike _connect(), it never creates the database,
+    its schema or the JSON migration.
+    """
+    import database
+
+    if not os.path.exists(database.DB_SQLITE):
+        return [], "unknown", [], 0
+    uri = f"{Path(database.DB_SQLITE).resolve().as_uri()}?mode=ro"
+    if not os.path.exists(f"{database.DB_SQLITE}-wal"):
+        # No writer has it open; a WAL reader would create the -wal/-shm files
+        uri += "&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, timeout=10)
+    try:
+        offers, date_range, notified = _cached_offers(conn)
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    finally:
+        conn.close()
+    return offers, date_range, notified, users
+
+
+def _cached_offers(conn: sqlite3.Connection) -> Tuple[List[Offer], str, List[str]]:
+    rows = conn.execute(
+        "SELECT data FROM offers WHERE date >= ? OR date NOT GLOB ? ORDER BY rowid",
+        (date.today().isoformat(), _ISO_DATE_GLOB),
+    )
+    current_offers = [Offer.from_dict(json.loads(row[0])) for row in rows]
+    date_range = conn.execute(
+        "SELECT value FROM meta WHERE key = 'date_range'"
+    ).fetchone()
+    notified = [row[0] for row in conn.execute("SELECT offer_id FROM notified_offers")]
+    return current_offers, date_range[0] if date_range else "unknown", notified
+
+
+def mark_offers_as_notified(offer_ids):
+    """Mark offers as already notified to avoid duplicate alerts."""
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR IGNORE INTO notified_offers (offer_id) VALUES (?)",
+            ((nid,) for nid in offer_ids),
+        )
+
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import database
+import metrics
+from diff import SnapshotDiff, diff_offers
+from filters import FilterIndex, OfferFilter
+from models import Offer, SortedOffers
+from scraper import format_offer_message
+
+logger = logging.getLogger("State")
+
+
+class BotState:
+    """
+    Process-wide copy of the subscribers, cached offers and notified IDs.
+
+    Loaded once at startup and shared by the command handlers and the
+    scan. Mutations update memory under an asyncio lock and are written
+    to the database by a single background writer, in order.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users: Set[int] = set()
+        self.notified: Set[str] = set()
+        self.filters: Dict[int, OfferFilter] = {}
+        # Rebuilt lazily after users or filters change
+        self._index: Optional[FilterIndex] = None
+        self.date_range = "unknown"
+        # Bumped by every save_offers; keys the rendered /offers message
+        self.offers_version = 0
+        self._rendered_key: Optional[Tuple[int, date]] = None
+        self._rendered: Tuple[List[Offer], str] = ([], "")
+        # Date-sorted, so expiring past days is a single bisect
+        self._offers = SortedOffers()
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        """Reads everything from disk once and starts the background writer."""
+        await asyncio.to_thread(database.import_legacy_subscribers)
+        await self._load()
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(
+            f"Loaded {len(self.users)} users and {len(self._offers)} offers into memory"
+        )
+
+    async def reload(self) -> None:
+        """
+        Reads everything again after our pending writes, picking up what
+        other replicas sharing the database changed.
+        """
+        if self._writes is not None:
+            await self._writes.join()
+        await self._load()
+
+    async def _load(self) -> None:
+        users = await self._read(database.get_users)
+        filters = await self._read(database.get_filters)
+        offers, date_range, notified = await self._read(database.load_cached_offers)
+        async with self.lock:
+            self.users = set(users)
+            self.filters = {
+                user_id: OfferFilter.from_dict(data)
+                for user_id, data in filters.items()
+            }
+            self._index = None
+            self.notified = set(notified)
+            self._set_offers(offers, date_range)
+
+    async def close(self) -> None:
+        """Waits for pending writes and stops the background writer."""
+        if self._writer is None:
+            return
+        await self._writes.join()
+        self._writer.cancel()
+        self._writer = None
+        await asyncio.to_thread(database.flush)
+
+    def current_offers(self) -> List[Offer]:
+        """Cached offers from today on, without touching the disk."""
+        return self._render()[0]
+
+    def offers_message(self) -> str:
+        """The /offers reply, rendered once per snapshot and per day."""
+        return self._render()[1]
+
+    def _render(self) -> Tuple[List[Offer], str]:
+        # Past offers expire at midnight, when the date part of the key changes
+        key = (self.offers_version, date.today())
+        if key != self._rendered_key:
+            offers = self._offers.current(key[1])
+            self._rendered = (offers, format_offer_message(offers))
+            self._rendered_key = key
+        return self._rendered
+
+    def diff(self, offers: List[Offer]) -> SnapshotDiff:
+        """Changes from the cached snapshot to `offers` (call before saving)."""
+        return diff_offers(self._offers, offers, self.notified)
+
+    def filter_index(self) -> FilterIndex:
+        """Discipline/weekday index of the subscribers, for fan-out."""
+        if self._index is None:
+            self._index = FilterIndex(self.users, self.filters)
+        return self._index
+
+    async def add_user(self, user_id: int) -> bool:
+        """Subscribes a user; returns False if they were already subscribed."""
+        async with self.lock:
+            if user_id in self.users:
+                return False
+            self.users.add(user_id)
+            self._index = None
+            self._persist(database.add_user, user_id)
+            return True
+
+    async def remove_user(self, user_id: int) -> None:
+        async with self.lock:
+            if user_id in self.users:
+                self.users.discard(user_id)
+                self.filters.pop(user_id, None)
+                self._index = None
+                self._persist(database.remove_user, user_id)
+
+    async def remove_users(self, user_ids: Iterable[int]) -> int:
+        """Unsubscribes several users with a single write; returns how many."""
+        async with self.lock:
+            removed = self.users & set(user_ids)
+            if removed:
+                self.users -= removed
+                for user_id in removed:
+                    self.filters.pop(user_id, None)
+                self._index = None
+                self._persist(database.remove_users, removed)
+            return len(removed)
+
+    async def set_filter(self, user_id: int, offer_filter: Optional[OfferFilter]):
+        """Sets (or clears, with None) a subscriber's offer filter."""
+        async with self.lock:
+            if offer_filter is None:
+                self.filters.pop(user_id, None)
+            else:
+                self.filters[user_id] = offer_filter
+            self._index = None
+            self._persist(
+                database.set_filter,
+                user_id,
+                offer_filter.to_dict() if offer_filter else None,
+            )
+
+    async def save_offers(self, offers: List[Offer], date_range: str) -> None:
+        """Replaces the offers snapshot, mirroring database.save_offers."""
+        async with self.lock:
+            self._set_offers(offers, date_range)
+            self._offers.prune(date.today())
+            current_ids = {offer.id for offer in self._offers}
+            self.notified &= current_ids
+            self._persist(database.save_offers, offers, date_range)
+
+    async def mark_notified(self, offer_ids: Iterable[str]) -> None:
+        offer_ids = list(offer_ids)
+        async with self.lock:
+            self.notified.update(offer_ids)
+            self._persist(database.mark_offers_as_notified, offer_ids)
+
+    def _set_offers(self, offers: List[Offer], date_range: str) -> None:
+        self._offers = SortedOffers(offers)
+        self.date_range = date_range
+        self.offers_version += 1
+
+    async def _read(self, func: Callable):
+        with metrics.DB_READ_SECONDS.labels(func.__name__).time():
+            return await asyncio.to_thread(func)
+
+    def _persist(self, func: Callable, *args) -> None:
+        if self._writes is None:
+            # Not loaded (scripts, tests): write through synchronously
+            func(*args)
+            return
+        self._writes.put_nowait((func, args))
+
+    async def _write_loop(self) -> None:
+        while True:
+            func, args = await self._writes.get()
+            try:
+                with metrics.DB_WRITE_SECONDS.labels(func.__name__).time():
+                    await asyncio.to_thread(func, *args)
+            except Exception as e:
+                logger.error(f"❌ Background write {func.__name__} failed: {e}")
+            finally:
+                self._writes.task_done()
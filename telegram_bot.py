@@ -1,60 +1,51 @@
 import os
-import json
 import logging
 import requests
 
+import database
+
 logger = logging.getLogger(__name__)
 
 # Configuration
 TELEGRAM_TOKEN = os.getenv("BOT_TOKEN")
-DB_FILE = "subscribers.json"
 
 
 def load_subscribers():
-    if not os.path.exists(DB_FILE):
-        return []
-    try:
-        with open(DB_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return []
+    # Same subscriber store as bot.py; picks up an old subscribers.json once
+    database.import_legacy_subscribers()
+    return database.get_users()
 
 
 def save_subscriber(chat_id):
-    subs = load_subscribers()
-    if chat_id not in subs:
-        subs.append(chat_id)
-        with open(DB_FILE, "w") as f:
-            json.dump(subs, f)
+    if database.add_user(chat_id):
         logger.info(f"✅ New subscriber saved: {chat_id}")
         return True
     return False
 
 
 def remove_subscriber(chat_id):
-    subs = load_subscribers()
-    if chat_id in subs:
-        subs.remove(chat_id)
-        with open(DB_FILE, "w") as f:
-            json.dump(subs, f)
-        logger.info(f"🗑️ Subscriber removed: {chat_id}")
+    database.remove_user(chat_id)
+    logger.info(f"🗑️ Subscriber removed: {chat_id}")
 
 
 def send_message(chat_id, text):
+    """Sends a message; returns False if the chat is dead (blocked, deleted...)."""
     if not TELEGRAM_TOKEN:
         logger.error("Missing TELEGRAM_TOKEN")
-        return
+        return True
 
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
     try:
         r = requests.post(url, data=payload, timeout=10)
-        # If user blocked the bot (403), remove them from database
-        if r.status_code == 403:
-            logger.warning(f"User {chat_id} blocked the bot. Removing.")
-            remove_subscriber(chat_id)
+        # Blocked bot or deactivated user (403), deleted chat (400)
+        description = r.json().get("description", "") if not r.ok else ""
+        if r.status_code == 403 or "chat not found" in description.lower():
+            logger.warning(f"Chat {chat_id} is unreachable ({description}).")
+            return False
     except Exception as e:
         logger.error(f"Error sending message to {chat_id}: {e}")
+    return True
 
 
 def broadcast_message(text_message):
@@ -64,8 +55,11 @@ def broadcast_message(text_message):
         return
 
     logger.info(f"📢 Broadcasting alert to {len(subs)} users...")
-    for chat_id in subs:
-        send_message(chat_id, text_message)
+    dead = [chat_id for chat_id in subs if not send_message(chat_id, text_message)]
+    if dead:
+        # One write for the whole broadcast instead of one per blocked user
+        database.remove_users(dead)
+        logger.info(f"🗑️ Removed {len(dead)} unreachable subscribers")
 
 
 def check_updates(last_update_id):
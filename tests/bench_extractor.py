@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import re
+import timeit
+
+import payload
+from page_fixtures import make_offers, make_page, make_rates
+
+# The extraction scraper.py used before payload.FlightScanner
+LEGACY_OFFERS_PATTERN = re.compile(r'\\?"offers\\?":\s*(\[\{.*?\}\])')
+LEGACY_RATES_PATTERN = re.compile(r'\\?"rates\\?":\s*(\[\{.*?\}\])')
+
+SIZES = [(10, 200), (200, 500), (2000, 1000), (10000, 2000)]
+RUNS = 5
+
+
+def legacy_extract(html):
+    offers = LEGACY_OFFERS_PATTERN.search(html)
+    rates = LEGACY_RATES_PATTERN.search(html)
+    return (
+        json.loads(offers.group(1).replace('\\"', '"').replace("$D", "")),
+        json.loads(rates.group(1).replace('\\"', '"').replace("$D", "")),
+    )
+
+
+def _safe_legacy(html):
+    try:
+        return legacy_extract(html)
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+def _best_ms(func, html):
+    return min(timeit.repeat(lambda: func(html), number=1, repeat=RUNS)) * 1000
+
+
+def bench_page(count, filler_kb, nested):
+    # Single chunk so the legacy regex has a chance to read it
+    offers = make_offers(count, nested=nested)
+    html = make_page(offers, make_rates(), filler_kb, chunk_size=None)
+
+    expected = payload.extract_payload(html)["offers"]
+    legacy_result = _safe_legacy(html)
+    legacy_ok = legacy_result is not None and legacy_result[0] == expected
+
+    print(
+        f"{count:>7} {'yes' if nested else 'no':>7} {len(html) // 1024:>8} "
+        f"{_best_ms(_safe_legacy, html):>10.2f} "
+        f"{_best_ms(payload.extract_payload, html):>11.2f}  "
+        f"{'yes' if legacy_ok else 'NO'}"
+    )
+
+
+def run_benchmark():
+    print(
+        f"{'offers':>7} {'nested':>7} {'page KB':>8} {'legacy ms':>10} "
+        f"{'scanner ms':>11}  legacy ok?"
+    )
+    for nested in (False, True):
+        for count, filler_kb in SIZES:
+            bench_page(count, filler_kb, nested)
+
+
+if __name__ == "__main__":
+    run_benchmark()
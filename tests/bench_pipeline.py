@@ -0,0 +1,215 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+import database
+import payload
+import scraper
+from page_fixtures import make_offers, make_page, make_rates
+from rates import RateTable
+from state import BotState
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+DEFAULT_OUTPUT = Path(__file__).parent / "bench_results.json"
+
+# (offers, filler KB): today's page is a few dozen offers in ~300 KB
+SIZES = [(40, 300), (500, 500), (2000, 1000), (5000, 2000)]
+RUNS = 5
+# Share of the offers already notified when timing the new-offer diff
+NOTIFIED_SHARE = 0.9
+BACKENDS = ("json", "sqlite")
+# Weeks of standard prices computed by the rate_calendar stage
+CALENDAR_WEEKS = 8
+
+
+def load_fixtures(sizes, synthetic=False):
+    """
+    Recorded pages from tests/fixtures/*.html (captured with --record).
+    Synthetic pages at each size are used instead when none was recorded,
+    and added after the recorded ones with `synthetic`.
+    """
+    pages = []
+    if FIXTURES_DIR.is_dir():
+        for path in sorted(FIXTURES_DIR.glob("*.html")):
+            pages.append((path.stem, path.read_text(encoding="utf-8")))
+    if pages and not synthetic:
+        return pages
+    if not pages:
+        print(f"⚠️ No recorded pages in {FIXTURES_DIR}, using synthetic ones")
+    for count, filler_kb in sizes:
+        offers = make_offers(count)
+        pages.append((f"synthetic-{count}", make_page(offers, make_rates(), filler_kb)))
+    return pages
+
+
+def record_fixture():
+    """Saves the live page as a fixture so later runs are offline."""
+    import requests
+
+    response = requests.get(scraper.BASE_URL, headers=scraper.HEADERS, timeout=15)
+    response.raise_for_status()
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    path = FIXTURES_DIR / f"live-{datetime.now():%Y%m%d-%H%M}.html"
+    path.write_text(response.text, encoding="utf-8")
+    print(f"💾 Recorded {len(response.text) // 1024} KB to {path}")
+
+
+def _time(func, runs):
+    samples = timeit.repeat(func, number=1, repeat=runs)
+    return {
+        "best_ms": round(min(samples) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+    }
+
+
+def _scan(html):
+    scanner = payload.FlightScanner()
+    scanner.feed(html)
+    scanner.finish()
+    return scanner
+
+
+def bench_page(name, html, runs):
+    """Times every stage of one scan on `html`."""
+    scanner = _scan(html)
+    raw_offers = scanner.decode("offers") or []
+    items = [scraper._process_offer(item) for item in raw_offers]
+    rates = RateTable(scanner.decode("rates") or [])
+    today = datetime.now().date()
+    offers = [item for item in items if item.is_offer]
+
+    state = BotState()
+    notified = offers[: int(len(offers) * NOTIFIED_SHARE)]
+    state.notified = {database.offer_id(offer) for offer in notified}
+    # The previous snapshot: the notified share of the page
+    state._set_offers(notified, "bench")
+
+    stages = {
+        "extract": lambda: _scan(html),
+        "decode": lambda: scanner.decode("offers"),
+        "process_offer": lambda: [scraper._process_offer(i) for i in raw_offers],
+        "parse_total": lambda: scraper._parse_offers(html),
+        "rate_calendar": lambda: rates.calendar(today, CALENDAR_WEEKS),
+        "format_message": lambda: scraper.format_offer_message(offers),
+        "snapshot_diff": lambda: state.diff(offers),
+    }
+    results = []
+    for stage, func in stages.items():
+        results.append({"stage": stage, **_time(func, runs)})
+
+    for backend in BACKENDS:
+        database.DB_BACKEND = backend
+
+        def save():
+            database.save_offers(offers, "bench")
+            database.flush()
+
+        save()
+        results.append({"stage": f"save_offers[{backend}]", **_time(save, runs)})
+        results.append(
+            {
+                "stage": f"load_cached_offers[{backend}]",
+                **_time(database.load_cached_offers, runs),
+            }
+        )
+
+    for result in results:
+        result.update(page=name, offers=len(offers), page_kb=len(html) // 1024)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(previous_path, results):
+    """Prints the change against a previous results file."""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r["page"], r["stage"]): r["best_ms"] for r in previous["results"]}
+    print(f"\nCompared with {previous['revision']} ({previous['created']}):")
+    for result in results:
+        old = before.get((result["page"], result["stage"]))
+        if not old:
+            continue
+        change = (result["best_ms"] - old) / old * 100
+        flag = "🔴" if change > 10 else "🟢" if change < -10 else "  "
+        print(
+            f"{flag} {result['page']:<18} {result['stage']:<26} "
+            f"{old:>9.2f} -> {result['best_ms']:>9.2f} ms ({change:+.0f}%)"
+        )
+
+
+def run_benchmark(output, runs, previous=None, synthetic=False):
+    pages = load_fixtures(SIZES, synthetic)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the real data/ directory untouched
+        database.DB_PATH = tmp
+        database.DB_FILE_USERS = os.path.join(tmp, "database.json")
+        database.DB_OFFERS_CACHE = os.path.join(tmp, "offers_cache.json")
+        database.DB_SQLITE = os.path.join(tmp, "database.sqlite3")
+
+        print(f"{'page':<18} {'offers':>7} {'KB':>6} {'stage':<26} {'best ms':>9}")
+        for name, html in pages:
+            for result in bench_page(name, html, runs):
+                results.append(result)
+                print(
+                    f"{name:<18} {result['offers']:>7} {result['page_kb']:>6} "
+                    f"{result['stage']:<26} {result['best_ms']:>9.2f}"
+                )
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "results": results,
+    }
+    if previous:
+        compare(previous, results)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline scan pipeline benchmark")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--compare", help="previous results file to diff against")
+    parser.add_argument(
+        "--record", action="store_true", help="save the live page as a fixture first"
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="time the synthetic pages too (the default without recorded ones)",
+    )
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture()
+    started = time.perf_counter()
+    run_benchmark(args.output, args.runs, args.compare, args.synthetic)
+    print(f"⏱️ Done in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import os
+import tempfile
+
+import database
+import scraper
+from page_fixtures import make_offers
+from state import BotState
+
+# A scan saved, read back from disk (as after a restart, or before every
+# scan with replicas) and diffed against the same scan must be empty,
+# including for prices that are not whole euros.
+#
+#   python tests/check_snapshot_roundtrip.py
+
+
+async def roundtrip(backend):
+    database.DB_BACKEND = backend
+    raw = make_offers(30, seed=7)
+    # Deposits of 24.75€: a real price of 49.50€, shown rounded as "50€"
+    for item in raw[::3]:
+        item["cents"] = 2475
+    offers = [scraper._process_offer(item) for item in raw]
+
+    state = BotState()
+    await state.load()
+    await state.save_offers(offers, "roundtrip")
+    await state.close()
+
+    state = BotState()
+    await state.load()
+    changes = state.diff(offers)
+    await state.close()
+    status = "✅" if not changes else "❌"
+    print(f"{status} {backend}: {changes.summary()}")
+    return not changes
+
+
+async def main():
+    results = []
+    for backend in ("json", "sqlite"):
+        results.append(await roundtrip(backend))
+    return all(results)
+
+
+if __name__ == "__main__":
+    os.chdir(tempfile.mkdtemp(prefix="roundtrip-"))
+    if not asyncio.run(main()):
+        raise SystemExit("❌ A reloaded snapshot differs from the scan it saved")
@@ -0,0 +1,322 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import httpx
+import tornado.web
+from telegram import Update
+from telegram.ext import ApplicationBuilder, CommandHandler
+
+import bot
+from broadcaster import percentile
+
+# Token of the fake Bot API; any well-formed one works
+FAKE_TOKEN = "123456:LOADTEST"
+
+# Load test: the bot's ApplicationBuilder pointed at a local stand-in for
+# api.telegram.org (own process, configurable latency and failures), then
+#   1. a scan alerting every subscriber, through the outbox and broadcaster
+#   2. a flood of concurrent /offers and /start commands
+# reporting delivery latency, messages/s and event-loop lag.
+#
+#   python tests/load_test.py --users 5000 --rate 1000 --latency 40 --p429 0.001
+
+
+class FakeBotAPI(tornado.web.RequestHandler):
+    """POST /bot<token>/<method>, answering like the Bot API."""
+
+    def initialize(self, options, stats, delivered):
+        self.options = options
+        self.stats = stats
+        self.delivered = delivered
+
+    async def post(self, token, method):
+        opts = self.options
+        self.stats["requests"] += 1
+        params = {k: v[-1].decode() for k, v in self.request.body_arguments.items()}
+        if not params and self.request.body:
+            params = json.loads(self.request.body)
+        delay = random.gauss(opts.latency, opts.latency / 4)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if method == "getMe":
+            return self._ok(
+                {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+            )
+        if method != "sendMessage":
+            return self._ok(True)
+
+        roll = random.random()
+        if roll < opts.p_timeout:
+            self.stats["timeouts"] += 1
+            # Longer than the client's read timeout: it gives up first
+            await asyncio.sleep(opts.client_timeout * 2)
+            return self._ok(True)
+        if roll < opts.p_timeout + opts.p429:
+            self.stats["429"] += 1
+            return self._error(
+                429, "Too Many Requests: retry after", {"retry_after": opts.retry_after}
+            )
+        chat_id = int(params.get("chat_id", 0))
+        # Deterministic per chat, so a blocked chat stays blocked
+        if random.Random(chat_id).random() < opts.p403:
+            self.stats["403"] += 1
+            return self._error(403, "Forbidden: bot was blocked by the user")
+
+        self.stats["sent"] += 1
+        # The same text to the same chat again is a duplicate alert
+        key = (chat_id, params.get("text", ""))
+        if key in self.delivered:
+            self.stats["duplicates"] += 1
+        self.delivered.add(key)
+        self._ok(
+            {
+                "message_id": self.stats["sent"],
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        )
+
+    def _ok(self, result):
+        self.write({"ok": True, "result": result})
+
+    def _error(self, code, description, parameters=None):
+        self.set_status(code)
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        self.write(body)
+
+
+class Stats(tornado.web.RequestHandler):
+    def initialize(self, stats):
+        self.stats = stats
+
+    def get(self):
+        self.write(self.stats)
+
+
+def run_fake_api(options, port):
+    # 403s and 429s are expected here, not worth a log line each
+    logging.getLogger("tornado.access").setLevel(logging.ERROR)
+
+    async def serve():
+        stats = {
+            "requests": 0,
+            "sent": 0,
+            "duplicates": 0,
+            "429": 0,
+            "403": 0,
+            "timeouts": 0,
+        }
+        handler_args = {"options": options, "stats": stats, "delivered": set()}
+        app = tornado.web.Application(
+            [
+                (r"/bot([^/]+)/(\w+)", FakeBotAPI, handler_args),
+                (r"/stats", Stats, {"stats": stats}),
+            ]
+        )
+        app.listen(port, address="127.0.0.1")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def wait_until_up(url):
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError(f"Fake Bot API did not start at {url}")
+
+
+class LoopLag:
+    """Samples how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+    def describe(self):
+        ordered = sorted(self.samples) or [0.0]
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (
+            f"p50 {ordered[len(ordered) // 2] * 1000:.1f} ms, "
+            f"p99 {p99 * 1000:.1f} ms, max {ordered[-1] * 1000:.1f} ms"
+        )
+
+
+def command_update(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }
+
+
+async def broadcast_phase(args, telegram_bot):
+    """A scan finding new offers, with every subscriber unfiltered."""
+    from broadcaster import Broadcaster
+    from outbox import OutboxSender
+    from page_fixtures import make_offers
+    import scraper
+
+    for chat_id in range(1, args.users + 1):
+        await bot.state.add_user(chat_id)
+    offers = [scraper._process_offer(raw) for raw in make_offers(args.offers)]
+
+    async def fetch(skip_unchanged=False):
+        return offers, "load test"
+
+    bot.pipeline.fetch = fetch
+    broadcaster = Broadcaster(telegram_bot, global_rate=args.rate)
+    bot.outbox_sender = OutboxSender(bot.outbox, broadcaster)
+
+    started = time.perf_counter()
+    await bot.scheduled_scan()
+    queued = time.perf_counter() - started
+    report = await bot.outbox_sender.drain()
+    await bot.prune_dead_chats(report)
+    print(f"\n📢 Broadcast to {args.users} subscribers (cap {args.rate:g} msg/s)")
+    print(f"   Scan + fan-out + queueing: {queued * 1000:.0f} ms")
+    print(f"   {report.summary()}")
+    print(f"   Subscribers left: {len(bot.state.users)}")
+
+
+async def command_phase(args, app):
+    """`args.commands` /offers and /start updates arriving at once."""
+    updates = [
+        Update.de_json(
+            command_update(i, 100_000 + i, "/offers" if i % 2 else "/start"), app.bot
+        )
+        for i in range(args.commands)
+    ]
+    latencies = []
+    errors = []
+
+    async def on_error(update, context):
+        errors.append(context.error)
+
+    app.add_error_handler(on_error)
+
+    async def handle(update):
+        started = time.perf_counter()
+        # What the update fetcher does with each update it takes off the queue
+        await app.update_processor.process_update(update, app.process_update(update))
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(update) for update in updates))
+    elapsed = time.perf_counter() - started
+    p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+    print(f"\n💬 {args.commands} concurrent commands (/offers and /start)")
+    print(
+        f"   {elapsed:.2f}s, {args.commands / elapsed:.1f} replies/s, "
+        f"reply latency p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, "
+        f"{len(errors)} failed"
+    )
+
+
+async def load_test(args, api_url):
+    # One log line per message would dominate the run; failures are counted
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("Broadcaster").setLevel(logging.CRITICAL)
+
+    await wait_until_up(f"{api_url}/stats")
+    builder = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .base_url(f"{api_url}/bot")
+        .read_timeout(args.client_timeout)
+        .concurrent_updates(args.concurrent_updates)
+    )
+    if args.pool_size:
+        builder = builder.connection_pool_size(args.pool_size)
+    app = builder.build()
+    app.add_handler(CommandHandler("start", bot.start))
+    app.add_handler(CommandHandler("offers", bot.offers_cmd))
+    await app.initialize()
+    await bot.state.load()
+
+    lag = LoopLag()
+    lag.start()
+    try:
+        await broadcast_phase(args, app.bot)
+        await command_phase(args, app)
+    finally:
+        lag.stop()
+        await bot.state.close()
+        await app.shutdown()
+    print(f"\n⏱️ Event-loop lag: {lag.describe()}")
+
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"{api_url}/stats")).json()
+    print(f"🛰️ Fake Bot API: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test against a fake Bot API")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--offers", type=int, default=5, help="new offers in the scan")
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument(
+        "--rate", type=float, default=30, help="broadcaster msg/s (Telegram: 30)"
+    )
+    parser.add_argument("--concurrent-updates", type=int, default=1)
+    parser.add_argument(
+        "--pool-size", type=int, help="bot HTTP connections (library default: 256)"
+    )
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=30, help="mean API ms")
+    parser.add_argument("--p429", type=float, default=0.0, help="share of 429s")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--p403", type=float, default=0.0, help="blocked chats share")
+    parser.add_argument("--p-timeout", type=float, default=0.0, help="share of hangs")
+    parser.add_argument("--client-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(
+        target=run_fake_api, args=(args, args.port), daemon=True
+    )
+    server.start()
+    # Subscribers, outbox and cache go to a scratch data/ directory
+    os.chdir(tempfile.mkdtemp(prefix="load-test-"))
+    try:
+        asyncio.run(load_test(args, f"http://127.0.0.1:{args.port}"))
+    finally:
+        server.terminate()
@@ -0,0 +1,79 @@
+"""Synthetic PolFerrer pages shaped like the real Next.js output, for offline runs."""
+import json
+import random
+from datetime import date, timedelta
+
+DISCIPLINES = ["enduro", "trial", "motocross", "minimotos", "supermotard"]
+
+
+def make_offers(count, start=None, seed=0, nested=True):
+    rng = random.Random(seed)
+    start = start or date.today()
+    offers = []
+    slots_per_day = 10 * len(DISCIPLINES)
+    for i in range(count):
+        # Every offer is a distinct (day, hour, discipline) slot, like the real page
+        day = start + timedelta(days=i // slots_per_day)
+        hour = 9 + (i // len(DISCIPLINES)) % 10
+        offer = {
+            "date": f"$D{day.isoformat()}T{hour:02d}:00:00.000Z",
+            "hour": hour,
+            "cents": rng.choice([2500, 3000, 4500, 6000]),
+            "discipline": DISCIPLINES[i % len(DISCIPLINES)],
+        }
+        if nested:
+            # Objects nested in an array, which the old lazy regex cut in half
+            offer["extras"] = [{"kind": "promo", "level": i % 3}]
+        offers.append(offer)
+    return offers
+
+
+def make_rates(seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "dayOfWeek": day,
+            "hour": hour,
+            "discipline": discipline,
+            "cents": rng.choice([5000, 6000, 7500]),
+        }
+        for day in range(7)
+        for hour in range(9, 19)
+        for discipline in DISCIPLINES
+    ]
+
+
+def make_page(offers, rates=None, filler_kb=200, chunk_size=4096):
+    """
+    Builds an HTML page whose data sits in self.__next_f.push chunks.
+    chunk_size splits the payload line across several chunks (None keeps
+    it in one chunk, the only layout the old regex could read).
+    """
+    data = {"offers": offers}
+    if rates is not None:
+        data["rates"] = rates
+    payload_line = "5:" + json.dumps(["$", "OffersSection", None, data]) + "\n"
+    filler_line = "4:" + json.dumps({"children": "x" * 1000}) + "\n"
+
+    parts = ["<!DOCTYPE html><html><head><title>Pol Ferrer</title></head><body>"]
+    markup = "<span>Pol Ferrer Academy</span>" * (filler_kb * 20)
+    parts.append(f"<div>{markup}</div>")
+    for _ in range(max(1, filler_kb // 4)):
+        parts.append(_push(filler_line))
+    pieces = (
+        [payload_line]
+        if chunk_size is None
+        else [
+            payload_line[i : i + chunk_size]
+            for i in range(0, len(payload_line), chunk_size)
+        ]
+    )
+    for piece in pieces:
+        parts.append(_push(piece))
+    parts.append(_push(filler_line))
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def _push(text):
+    return f"<script>self.__next_f.push([1,{json.dumps(text)}])</script>"
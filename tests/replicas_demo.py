@@ -0,0 +1,179 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import tempfile
+import time
+
+import httpx
+
+import database
+from load_test import FAKE_TOKEN, run_fake_api
+from page_fixtures import make_offers, make_page, make_rates
+from replay import CaptureStub
+
+# Several `python main.py serve` replicas on one machine, sharing a data/
+# directory, against a fake Bot API and a local copy of the page:
+#   1. the leader scans and every subscriber gets the alert exactly once,
+#      sent by the replica owning their chat
+#   2. the page gets new offers and the leader is killed: another replica
+#      takes the lease, scans, and the new alert is again sent exactly once
+#
+#   python tests/replicas_demo.py --replicas 3 --users 60
+
+MAIN = str(Path(__file__).resolve().parent.parent / "main.py")
+LEASE_SECONDS = 3
+
+
+def replica_env(index, args, page_url):
+    env = dict(os.environ)
+    env.update(
+        BOT_TOKEN=FAKE_TOKEN,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.api_port}",
+        BOT_MODE="webhook",
+        WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port + index}/telegram",
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=str(args.webhook_port + index),
+        DB_BACKEND="sqlite",
+        REPLICA_INDEX=str(index),
+        REPLICA_COUNT=str(args.replicas),
+        LEADER_LEASE_SECONDS=str(LEASE_SECONDS),
+        SCAN_URLS=page_url,
+        METRICS_PORT="0",
+    )
+    return env
+
+
+async def start_replica(index, args, page_url, log_dir):
+    log = open(os.path.join(log_dir, f"replica-{index}.log"), "ab")
+    return await asyncio.create_subprocess_exec(
+        sys.executable,
+        MAIN,
+        "serve",
+        env=replica_env(index, args, page_url),
+        stdout=log,
+        stderr=log,
+    )
+
+
+def lease_holder():
+    """Index of the replica holding the scanning lease, if any."""
+    path = os.path.join(database.DB_PATH, "leader.sqlite3")
+    if not os.path.exists(path):
+        return None
+    with sqlite3.connect(path) as conn:
+        row = conn.execute(
+            "SELECT holder FROM leases WHERE expires > ?", (time.time(),)
+        ).fetchone()
+    # Holders are "replica-<index>-<pid>"
+    return int(row[0].split("-")[1]) if row else None
+
+
+async def wait_for(condition, timeout, what):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        value = await condition()
+        if value:
+            return time.perf_counter() - started
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"Timed out waiting for {what}")
+
+
+async def api_stats(api_url):
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{api_url}/stats")).json()
+
+
+async def demo(args):
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    # Subscribers in the shared store before the replicas start
+    database.DB_BACKEND = "sqlite"
+    for chat_id in range(1, args.users + 1):
+        database.add_user(chat_id)
+
+    offers = make_offers(20, seed=1)
+    stub = CaptureStub()
+    await stub.start()
+    stub.show(make_page(offers, make_rates()))
+    log_dir = os.getcwd()
+
+    replicas = {}
+    for index in range(args.replicas):
+        replicas[index] = await start_replica(index, args, stub.url, log_dir)
+    try:
+        async def has_leader():
+            return lease_holder() is not None
+
+        took = await wait_for(has_leader, 30, "a leader")
+        leader = lease_holder()
+        print(f"👑 Replica {leader} elected in {took:.1f}s")
+
+        async def sent(count):
+            return (await api_stats(api_url))["sent"] >= count
+
+        took = await wait_for(lambda: sent(args.users), 60, "the first alert")
+        print(f"📢 First alert delivered to {args.users} chats in {took:.1f}s")
+
+        # New offers, and the leader dies before it can scan them
+        stub.show(make_page(make_offers(25, seed=1), make_rates()))
+        replicas[leader].send_signal(signal.SIGKILL)
+        await replicas[leader].wait()
+        print(f"💥 Killed replica {leader}")
+
+        async def new_leader():
+            holder = lease_holder()
+            return holder is not None and holder != leader
+
+        took = await wait_for(new_leader, 30, "a new leader")
+        print(f"👑 Replica {lease_holder()} took over after {took:.1f}s")
+        # Restarted, as a supervisor would, it sends its chats' alerts again
+        replicas[leader] = await start_replica(leader, args, stub.url, log_dir)
+
+        took = await wait_for(lambda: sent(2 * args.users), 90, "the second alert")
+        print(f"📢 Second alert delivered to {args.users} chats in {took:.1f}s")
+        stats = await api_stats(api_url)
+        print(f"🛰️ Fake Bot API: {stats}")
+        if stats["duplicates"] or stats["sent"] != 2 * args.users:
+            raise SystemExit("❌ Some chats got an alert twice")
+        print("✅ Every chat got each alert exactly once")
+    finally:
+        for process in replicas.values():
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+        await stub.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leader failover with local replicas")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook-port", type=int, default=8450)
+    args = parser.parse_args()
+
+    # Polling the fake API's counters is not worth a log line each time
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    api_options = argparse.Namespace(
+        latency=5, p429=0, p403=0, p_timeout=0, client_timeout=5, retry_after=1
+    )
+    server = multiprocessing.Process(
+        target=run_fake_api, args=(api_options, args.api_port), daemon=True
+    )
+    server.start()
+    workdir = tempfile.mkdtemp(prefix="replicas-")
+    os.chdir(workdir)
+    print(f"📂 Shared data and replica logs in {workdir}")
+    try:
+        asyncio.run(demo(args))
+    finally:
+        server.terminate()
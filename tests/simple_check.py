@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import sys
+from pathlib import Path
 
-sys.path.insert(0, "/home/jorge.gonzalez/personal/PolFerrerAcademyOffers")
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
 import database
 from datetime import datetime
 
@@ -7,6 +7,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import logging
 import scraper
 import database
+from diff import PRICE_DROP, PRICE_RISE, diff_offers
 import time
 
 # Basic logging configuration to see what happens
@@ -16,14 +17,6 @@ logging.basicConfig(
 logger = logging.getLogger("TestRun")
 
 
-# Copy the helper function from main.py
-def generate_offer_id(offer):
-    """Generate a unique ID for an offer based on its details."""
-    return (
-        f"{offer.get('discipline', '')}_{offer.get('date', '')}_{offer.get('time', '')}"
-    )
-
-
 def run_simulation():
     print("🚀 Starting simulation (DRY RUN)...")
 
@@ -38,28 +31,29 @@ def run_simulation():
         return
 
     # 2. Filter only real offers
-    offers = [item for item in all_items if item.get("is_offer", False)]
+    offers = [item for item in all_items if item.is_offer]
     print(f"📊 Total items found: {len(all_items)}")
     print(f"🔥 Real offers found: {len(offers)}")
 
     # 3. Load what we already have in database
-    _, _, notified_offer_ids = database.load_cached_offers()
+    cached_offers, _, notified_offer_ids = database.load_cached_offers()
     print(f"💾 Offers already notified previously in DB: {len(notified_offer_ids)}")
 
-    # 4. New offers detection logic
-    new_offers = []
-    new_offer_ids = []
-
-    for offer in offers:
-        offer_id = generate_offer_id(offer)
-
-        # Simulate the check
-        if offer_id not in notified_offer_ids:
-            new_offers.append(offer)
-            new_offer_ids.append(offer_id)
-            print(f"   -> [NEW] {offer['date']} - {offer['discipline']}")
-        else:
-            print(f"   -> [ALREADY SEEN] {offer['date']} - {offer['discipline']}")
+    # 4. Diff against the cached snapshot, as the bot does
+    changes = diff_offers(cached_offers, offers, set(notified_offer_ids))
+    print(f"🧮 {changes.summary()}")
+    for change in changes.changes():
+        offer = change.offer
+        label = change.kind.upper() + ("" if change.notify else ", silent")
+        changed = change.kind in (PRICE_DROP, PRICE_RISE)
+        was = f" (was {change.previous['price']})" if changed else ""
+        print(
+            f"   -> [{label}] {offer['date']} - {offer['discipline']} "
+            f"{offer['price']}{was}"
+        )
+
+    new_offers = [change.offer for change in changes.to_notify()]
+    new_offer_ids = [change.offer.id for change in changes.added]
 
     # 5. Simulate saving and notification
     if new_offers:
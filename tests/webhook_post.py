@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import project modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+
+# Stand-in for Telegram: POSTs command updates to a bot started with
+# BOT_MODE=webhook, e.g. WEBHOOK_URL=http://127.0.0.1:8443/telegram
+
+_update_ids = itertools.count(int(time.time()))
+
+
+def make_update(chat_id, text):
+    """A private-chat message update, as Telegram sends it."""
+    update_id = next(_update_ids)
+    entities = []
+    if text.startswith("/"):
+        entities.append(
+            {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+        )
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Test"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+async def post_updates(url, secret, chat_ids, text):
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    async with httpx.AsyncClient(timeout=10) as client:
+
+        async def post(chat_id):
+            started = time.perf_counter()
+            response = await client.post(
+                url, content=json.dumps(make_update(chat_id, text)), headers=headers
+            )
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(post(chat_id) for chat_id in chat_ids))
+        elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+    print(f"📨 Posted {len(results)} x {text!r} in {elapsed:.2f}s")
+    print(f"   Status codes: {statuses}")
+    print(
+        f"   Latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+        f"max {latencies[-1] * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POST fake updates to the webhook")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", help="WEBHOOK_SECRET of the bot, if set")
+    parser.add_argument("--text", default="/offers")
+    parser.add_argument("--chat", type=int, default=1000, help="first chat ID")
+    parser.add_argument("--count", type=int, default=1, help="chats posting at once")
+    args = parser.parse_args()
+
+    chat_ids = range(args.chat, args.chat + args.count)
+    asyncio.run(post_updates(args.url, args.secret, chat_ids, args.text))